@@ -0,0 +1,132 @@
+"""
+Token-pair association within a sliding window: PMI, NPMI and Dunning
+log-likelihood from streamed pair counts.
+
+Pairs (a, b) are tokens at distance 1..window on the same line, a before b.
+The token array is read in fixed-size chunks and each offset turns into
+one vector of pair codes a * V + b, counted with np.unique and folded into
+a sparse matrix, so memory is bounded by the chunk size and the number of
+distinct pairs seen, never by the corpus length.
+"""
+
+import numpy as np
+from scipy import sparse
+
+MEASURES = ('pmi', 'npmi', 'llr')
+
+
+def window_pair_counts(tokens, line_ids, vocab_size, window=1, symmetric=False, chunk_size=1 << 20):
+    """
+    Sparse (V, V) counts of ordered token pairs within `window` on a line.
+
+    Args:
+        tokens: Integer token ids in reading order
+        line_ids: Line id per token; pairs never cross a line change
+        vocab_size: V, number of token ids
+        window: Largest distance between the two tokens of a pair
+        symmetric: Count (b, a) alongside every (a, b)
+        chunk_size: Tokens read per chunk
+
+    Returns:
+        CSR matrix of float64 pair counts
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    tokens = np.asarray(tokens)
+    line_ids = np.asarray(line_ids)
+    n = len(tokens)
+    counts = sparse.csr_matrix((vocab_size, vocab_size))
+
+    for start in range(0, n, chunk_size):
+        # Left tokens come from this chunk; right tokens may run `window` past it
+        stop = min(start + chunk_size, n)
+        end = min(stop + window, n)
+        left, left_lines = tokens[start:stop].astype(np.int64), line_ids[start:stop]
+        codes = []
+        for offset in range(1, window + 1):
+            m = min(stop, end - offset) - start
+            if m <= 0:
+                break
+            right = tokens[start + offset:start + offset + m]
+            same_line = left_lines[:m] == line_ids[start + offset:start + offset + m]
+            codes.append(left[:m][same_line] * vocab_size + right[same_line])
+        if not codes:
+            continue
+        pairs, freq = np.unique(np.concatenate(codes), return_counts=True)
+        counts = counts + sparse.csr_matrix(
+            (freq.astype(np.float64), (pairs // vocab_size, pairs % vocab_size)),
+            shape=(vocab_size, vocab_size))
+
+    if symmetric:
+        counts = counts + counts.T
+    counts = counts.tocsr()
+    counts.sort_indices()
+    return counts
+
+
+def association_matrix(pair_counts, measure='npmi', min_count=1):
+    """
+    Association score for every observed pair, same sparsity as pair_counts.
+
+    Marginals are the row and column sums of pair_counts, N its total, so
+    scores describe the pair distribution itself. Pairs seen fewer than
+    min_count times are dropped.
+
+    measure:
+        'pmi'   log2(N n_ab / (n_a n_b))
+        'npmi'  pmi / -log2(n_ab / N), in [-1, 1]
+        'llr'   signed Dunning G^2 of the 2x2 contingency table
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"Unknown measure: {measure}. Choose from {MEASURES}")
+    counts = sparse.csr_matrix(pair_counts).tocoo()
+    keep = counts.data >= min_count
+    rows, cols, n_ab = counts.row[keep], counts.col[keep], counts.data[keep].astype(np.float64)
+    total = float(counts.data.sum())
+    n_a = np.asarray(pair_counts.sum(axis=1)).ravel()[rows]
+    n_b = np.asarray(pair_counts.sum(axis=0)).ravel()[cols]
+
+    pmi = np.log2(n_ab * total / (n_a * n_b))
+    if measure == 'pmi':
+        scores = pmi
+    elif measure == 'npmi':
+        p_ab = n_ab / total
+        scores = np.divide(pmi, -np.log2(p_ab), out=np.ones_like(pmi), where=p_ab < 1)
+    else:
+        observed = np.stack([n_ab, n_a - n_ab, n_b - n_ab, total - n_a - n_b + n_ab])
+        expected = np.stack([n_a * n_b, n_a * (total - n_b), (total - n_a) * n_b,
+                             (total - n_a) * (total - n_b)]) / total
+        terms = np.where(observed > 0, observed * np.log(np.maximum(observed, 1e-300) / expected), 0.0)
+        scores = 2 * terms.sum(axis=0) * np.sign(pmi)
+    return sparse.csr_matrix((scores, (rows, cols)), shape=pair_counts.shape)
+
+
+def top_k_per_token(scores, k=10):
+    """
+    The k highest-scoring partners of every row token.
+
+    Returns:
+        (rows, cols, values) arrays, grouped by row and sorted by decreasing
+        score within each row
+    """
+    scores = sparse.csr_matrix(scores)
+    row_of = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    order = np.lexsort((scores.indices, -scores.data, row_of))
+    row_sorted = row_of[order]
+    rank = np.arange(len(order)) - scores.indptr[row_sorted]
+    best = order[rank < k]
+    return row_of[best], scores.indices[best], scores.data[best]
+
+
+def top_pairs(scores, k=20, min_value=None):
+    """The k highest-scoring pairs overall as (a, b, score)."""
+    scores = sparse.csr_matrix(scores).tocoo()
+    values = scores.data
+    keep = np.ones(len(values), dtype=bool) if min_value is None else values >= min_value
+    idx = np.flatnonzero(keep)
+    if not len(idx):
+        return []
+    k = min(k, len(idx))
+    idx = idx[np.argpartition(-values[idx], k - 1)[:k]]
+    idx = idx[np.lexsort((scores.col[idx], scores.row[idx], -values[idx]))]
+    return list(zip(scores.row[idx].tolist(), scores.col[idx].tolist(), values[idx].tolist()))
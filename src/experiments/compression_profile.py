@@ -0,0 +1,133 @@
+"""
+Sliding-window compression ratios along the manuscript.
+
+Two modes:
+
+- 'window': every window is compressed on its own, so the ratio means
+  the same thing as exp01's whole-section gzip ratio. Nothing is shared
+  between overlapping windows: a standalone window has to be compressed
+  from scratch, so the cost is O(n * window / stride). Windows are split
+  into contiguous chunks on a thread pool (zlib, bz2 and lzma release the
+  GIL).
+- 'stream' (zlib only): a single compressor reads the text once. At each
+  stride boundary a copy() of it is finished to measure the compressed
+  prefix, and a window's cost is the difference between two prefixes:
+  what the window adds given everything before it, within the deflate
+  history. The copies share the prefix work, so the total cost is O(n)
+  and does not grow with window size.
+
+bz2 and lzma compressor objects can neither be copied nor flushed
+mid-stream, so they only support 'window' mode.
+"""
+
+import bz2
+import lzma
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+CODECS = ('zlib', 'bz2', 'lzma')
+
+
+class CompressionProfile(NamedTuple):
+    codec: str
+    mode: str
+    window: int
+    stride: int
+    starts: np.ndarray   # window start offsets into the data
+    ratios: np.ndarray   # compressed bytes / window bytes
+
+
+def window_starts(n, window, stride):
+    """Start offsets of all full windows."""
+    if window <= 0 or stride <= 0:
+        raise ValueError("window and stride must be positive")
+    if n < window:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(0, n - window + 1, stride, dtype=np.int64)
+
+
+def _window_compressor(codec, window, level):
+    """Callable bytes -> compressed size for one standalone window."""
+    if codec == 'zlib':
+        # Raw deflate: no header/checksum noise in tiny windows
+        def size(chunk):
+            return len(zlib.compress(chunk, level, wbits=-15))
+    elif codec == 'bz2':
+        def size(chunk):
+            return len(bz2.compress(chunk, level))
+    elif codec == 'lzma':
+        # Raw LZMA2 with a dictionary no larger than the window
+        filters = [{'id': lzma.FILTER_LZMA2, 'preset': level,
+                    'dict_size': max(4096, 1 << int(np.ceil(np.log2(max(window, 2)))))}]
+
+        def size(chunk):
+            return len(lzma.compress(chunk, format=lzma.FORMAT_RAW, filters=filters))
+    else:
+        raise ValueError(f"Unknown codec: {codec}. Choose from {CODECS}")
+    return size
+
+
+def _windowed_sizes(data, starts, window, codec, level, workers):
+    size = _window_compressor(codec, window, level)
+    view = memoryview(data)
+
+    def run(chunk_starts):
+        return [size(view[s:s + window]) for s in chunk_starts]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(starts) < 2 * workers:
+        return np.array(run(starts.tolist()), dtype=np.int64)
+    chunks = np.array_split(starts, workers)
+    with ThreadPoolExecutor(workers) as executor:
+        parts = list(executor.map(lambda c: run(c.tolist()), chunks))
+    return np.array([s for part in parts for s in part], dtype=np.int64)
+
+
+def _stream_sizes(data, starts, window, stride, level):
+    """Marginal compressed size of each window given its preceding history."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    view = memoryview(data)
+    # Compressed size of every stride-aligned prefix: finish a copy, keep going
+    boundaries = np.arange(0, len(data) + 1, stride)
+    prefix = np.zeros(len(boundaries), dtype=np.int64)
+    emitted = 0
+    for i in range(1, len(boundaries)):
+        emitted += len(compressor.compress(view[boundaries[i - 1]:boundaries[i]]))
+        prefix[i] = emitted + len(compressor.copy().flush())
+    steps = window // stride
+    first = starts // stride
+    return prefix[first + steps] - prefix[first]
+
+
+def compression_profile(data, window=2000, stride=250, codec='zlib', mode='window',
+                        level=9, workers=None):
+    """
+    Compression ratio of every window of `data` (bytes).
+
+    Args:
+        data: Bytes to profile, e.g. uint8 character codes in folio order
+        window: Window length in bytes
+        stride: Distance between window starts
+        codec: 'zlib', 'bz2' or 'lzma'
+        mode: 'window' (standalone) or 'stream' (zlib marginal cost;
+              window must be a multiple of stride)
+        level: Compression level / preset
+        workers: Threads for 'window' mode (None = all cores)
+    """
+    data = bytes(data)
+    starts = window_starts(len(data), window, stride)
+    if mode == 'window':
+        sizes = _windowed_sizes(data, starts, window, codec, level, workers)
+    elif mode == 'stream':
+        if codec != 'zlib':
+            raise ValueError(f"Stream mode needs a copyable compressor; {codec} only supports 'window'")
+        if window % stride:
+            raise ValueError("Stream mode needs window to be a multiple of stride")
+        sizes = _stream_sizes(data, starts, window, stride, level)
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+    return CompressionProfile(codec, mode, window, stride, starts, sizes / window)
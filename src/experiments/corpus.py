@@ -0,0 +1,308 @@
+"""
+Content-addressed binary cache of the parsed EVA transcription.
+Parse once, tokenize once, then memory-map the result forever after.
+Repetition is the one thing this manuscript and I have in common.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from parse_eva import (
+    LINE_END_RE,
+    SECTION_MAP,
+    TOKEN_CONTENT_RE,
+    TOKEN_SPLIT_RE,
+    folio_number,
+    get_section,
+    read_transcription_table,
+    tokenize,
+)
+
+TRANSCRIPTION = Path(__file__).parents[2] / 'data/raw/transcriptions/eva/v101-claston.txt'
+CACHE_DIR = Path(__file__).parents[2] / 'data/derived/cache/corpus'
+
+# Bump when the on-disk layout changes.
+CACHE_VERSION = 1
+
+SECTION_NAMES = list(SECTION_MAP) + ['other']
+
+ARRAY_NAMES = (
+    'folios', 'sections', 'section_names', 'folio_line_offsets',
+    'line_no', 'line_char_offsets', 'line_token_offsets',
+    'chars', 'alphabet', 'tokens', 'vocab',
+)
+
+
+def normalization_settings():
+    """Settings that affect the cached arrays; part of the cache key."""
+    return {
+        'version': CACHE_VERSION,
+        'line_end': LINE_END_RE.pattern,
+        'token_split': TOKEN_SPLIT_RE.pattern,
+        'token_content': TOKEN_CONTENT_RE.pattern,
+        'sections': {name: list(bounds) for name, bounds in SECTION_MAP.items()},
+    }
+
+
+def corpus_key(filepath=TRANSCRIPTION):
+    """SHA256 of the transcription bytes plus the normalization settings."""
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    sha256.update(json.dumps(normalization_settings(), sort_keys=True).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def build_corpus_arrays(filepath=TRANSCRIPTION):
+    """Parse and tokenize a transcription into flat NumPy arrays.
+
+    Folios are stored in folio-number order (file order within a number),
+    so every section occupies one contiguous run of lines, characters and
+    tokens. Offsets arrays have one more entry than the rows they index.
+    """
+    table = read_transcription_table(filepath)
+
+    # Regroup lines by folio in manuscript order
+    folio_rank = sorted(range(len(table.folios)), key=lambda i: folio_number(table.folios[i]))
+    rank_of = np.empty(len(folio_rank), dtype=np.int32)
+    rank_of[folio_rank] = np.arange(len(folio_rank), dtype=np.int32)
+    line_order = np.argsort(rank_of[table.folio_idx], kind='stable')
+
+    folios = np.array([table.folios[i] for i in folio_rank])
+    lines_per_folio = np.bincount(rank_of[table.folio_idx], minlength=len(folios))
+    folio_line_offsets = np.zeros(len(folios) + 1, dtype=np.int64)
+    np.cumsum(lines_per_folio, out=folio_line_offsets[1:])
+
+    texts = [table.text[i] for i in line_order]
+    line_no = table.line_no[line_order]
+
+    # Characters: every code point of the line text, encoded into the alphabet
+    line_char_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=line_char_offsets[1:])
+    codepoints = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32)
+    alphabet_points, char_codes = np.unique(codepoints, return_inverse=True)
+    alphabet = np.array([chr(c) for c in alphabet_points])
+    char_dtype = np.uint8 if len(alphabet) <= 256 else np.uint16
+
+    # Tokens: tokenized per line so token runs line up with line offsets
+    line_tokens = [tokenize(t) for t in texts]
+    line_token_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in line_tokens], out=line_token_offsets[1:])
+    flat_tokens = np.array([t for tokens in line_tokens for t in tokens])
+    vocab, token_ids = np.unique(flat_tokens, return_inverse=True)
+
+    sections = np.array([SECTION_NAMES.index(get_section(f)) for f in folios], dtype=np.int8)
+
+    return {
+        'folios': folios,
+        'sections': sections,
+        'section_names': np.array(SECTION_NAMES),
+        'folio_line_offsets': folio_line_offsets,
+        'line_no': line_no.astype(np.int32),
+        'line_char_offsets': line_char_offsets,
+        'line_token_offsets': line_token_offsets,
+        'chars': char_codes.astype(char_dtype),
+        'alphabet': alphabet,
+        'tokens': token_ids.astype(np.int32),
+        'vocab': vocab,
+    }
+
+
+def save_corpus_arrays(arrays, cache_path):
+    """Write arrays as .npy files, atomically replacing cache_path."""
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=cache_path.name + '.', dir=cache_path.parent))
+    try:
+        for name in ARRAY_NAMES:
+            np.save(tmp_dir / f'{name}.npy', arrays[name], allow_pickle=False)
+        os.replace(tmp_dir, cache_path)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process won the race; its copy is identical
+        if not (cache_path / 'vocab.npy').exists():
+            raise
+
+
+def load_corpus_arrays(filepath=TRANSCRIPTION, cache_dir=CACHE_DIR, mmap_mode='r'):
+    """Load corpus arrays from the cache, building them on a miss.
+
+    Arrays are opened with mmap_mode, so concurrent processes share pages.
+    """
+    cache_path = Path(cache_dir) / corpus_key(filepath)
+    if not (cache_path / 'vocab.npy').exists():
+        save_corpus_arrays(build_corpus_arrays(filepath), cache_path)
+    return {
+        name: np.load(cache_path / f'{name}.npy', mmap_mode=mmap_mode, allow_pickle=False)
+        for name in ARRAY_NAMES
+    }
+
+
+def pages_from_arrays(arrays):
+    """Rebuild the {folio: [lines]} mapping from corpus arrays."""
+    text = ''.join(np.asarray(arrays['alphabet'])[arrays['chars']])
+    char_offsets = arrays['line_char_offsets']
+    line_offsets = arrays['folio_line_offsets']
+    pages = {}
+    for i, folio in enumerate(arrays['folios']):
+        lo, hi = line_offsets[i], line_offsets[i + 1]
+        pages[str(folio)] = [text[char_offsets[j]:char_offsets[j + 1]] for j in range(lo, hi)]
+    return pages
+
+
+def load_pages(filepath=TRANSCRIPTION, cache_dir=CACHE_DIR):
+    """Cached equivalent of parse_eva.parse_transcription."""
+    return pages_from_arrays(load_corpus_arrays(filepath, cache_dir))
+
+
+def merge_ranges(ranges):
+    """Coalesce sorted (lo, hi) ranges that touch into maximal runs."""
+    merged = []
+    for lo, hi in ranges:
+        if merged and merged[-1][1] == lo:
+            merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def intersect_sorted(a, b):
+    """Intersection of two sorted unique id arrays."""
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def union_sorted(a, b):
+    """Union of two sorted unique id arrays."""
+    return np.union1d(a, b)
+
+
+def difference_sorted(a, b):
+    """Ids in a that are not in b (both sorted and unique)."""
+    return np.setdiff1d(a, b, assume_unique=True)
+
+
+# Corpora already opened in this process, keyed by (filepath, cache_dir)
+_LOADED = {}
+
+
+class Corpus:
+    """Integer-encoded corpus with one interned vocabulary and alphabet.
+
+    Tokens are int32 ids into `vocab` (sorted, so ids order like strings)
+    and characters are uint8 codes into `alphabet`. Counts are bincounts
+    and token sets are sorted unique id arrays.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.folios = [str(f) for f in arrays['folios']]
+        self.section_names = [str(s) for s in arrays['section_names']]
+        self.sections = arrays['sections']
+        self.folio_line_offsets = arrays['folio_line_offsets']
+        self.line_no = arrays['line_no']
+        self.line_char_offsets = arrays['line_char_offsets']
+        self.line_token_offsets = arrays['line_token_offsets']
+        self.chars = arrays['chars']
+        self.alphabet = arrays['alphabet']
+        self.tokens = arrays['tokens']
+        self.vocab = arrays['vocab']
+        self._folio_ids = {f: i for i, f in enumerate(self.folios)}
+        self._token_ids = None
+        self._token_lengths = None
+
+    @classmethod
+    def load(cls, filepath=TRANSCRIPTION, cache_dir=CACHE_DIR):
+        """Load (once per process) the cached corpus for a transcription.
+
+        Forked worker processes inherit the already-mapped arrays.
+        """
+        key = (str(filepath), str(cache_dir))
+        if key not in _LOADED:
+            _LOADED[key] = cls(load_corpus_arrays(filepath, cache_dir))
+        return _LOADED[key]
+
+    @property
+    def num_lines(self):
+        return len(self.line_no)
+
+    @property
+    def token_lengths(self):
+        """Character length of every vocabulary entry, indexed by token id."""
+        if self._token_lengths is None:
+            self._token_lengths = np.char.str_len(np.asarray(self.vocab))
+        return self._token_lengths
+
+    def token_id(self, token):
+        """Interned id of a token string (KeyError if unseen)."""
+        if self._token_ids is None:
+            self._token_ids = {str(t): i for i, t in enumerate(self.vocab)}
+        return self._token_ids[token]
+
+    def folio_id(self, folio):
+        return self._folio_ids[folio]
+
+    def line_ranges(self, folio_indices):
+        """Merged line ranges covering the given folios (sorted indices)."""
+        offsets = self.folio_line_offsets
+        return merge_ranges((int(offsets[i]), int(offsets[i + 1])) for i in folio_indices)
+
+    def _gather(self, data, offsets, line_ranges):
+        parts = [data[offsets[lo]:offsets[hi]] for lo, hi in line_ranges]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return data[:0]
+        return np.concatenate(parts)
+
+    def tokens_in(self, line_ranges):
+        """Token ids for line ranges; a view when there is a single range."""
+        return self._gather(self.tokens, self.line_token_offsets, line_ranges)
+
+    def chars_in(self, line_ranges):
+        """Character codes for line ranges; a view when there is a single range."""
+        return self._gather(self.chars, self.line_char_offsets, line_ranges)
+
+    def folio_tokens(self, folio_index):
+        return self.tokens_in(self.line_ranges([folio_index]))
+
+    def token_counts(self, tokens):
+        """Token frequencies over the whole vocabulary."""
+        return np.bincount(tokens, minlength=len(self.vocab))
+
+    def char_counts(self, chars):
+        """Character frequencies over the whole alphabet."""
+        return np.bincount(chars, minlength=len(self.alphabet))
+
+    def token_set(self, tokens):
+        """Sorted unique token ids."""
+        return np.unique(tokens)
+
+    def char_mask(self, predicate):
+        """Boolean mask over the alphabet selecting characters by predicate."""
+        return np.array([bool(predicate(c)) for c in self.alphabet.tolist()], dtype=bool)
+
+    def decode_tokens(self, tokens):
+        return [str(t) for t in np.asarray(self.vocab)[tokens]]
+
+    def decode_chars(self, chars):
+        return ''.join(np.asarray(self.alphabet)[chars])
+
+    def line_texts(self, line_ranges):
+        """Raw text of every line in the given ranges."""
+        text = self.decode_chars(self.chars_in(line_ranges))
+        starts = np.concatenate([self.line_char_offsets[lo:hi] for lo, hi in line_ranges] or [[]])
+        ends = np.concatenate([self.line_char_offsets[lo + 1:hi + 1] for lo, hi in line_ranges] or [[]])
+        # Positions relative to the gathered text
+        shift = np.cumsum(ends - starts) - (ends - starts)
+        return [text[a:a + n] for a, n in zip(shift.tolist(), (ends - starts).tolist())]
+
+    def pages(self):
+        """The {folio: [lines]} mapping used by the string-based helpers."""
+        return pages_from_arrays(self.arrays)
@@ -0,0 +1,156 @@
+"""
+Block and conditional n-gram entropy over integer-encoded characters.
+
+Every order n = 1..N is computed from one rolling base-k code array, and
+every group (section, folio, ...) is handled in the same np.unique call by
+prefixing the n-gram code with its group id. N-grams never cross segment
+(line) boundaries.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+# Fewer (n+1)-grams than this and H(char | n chars) is reported as NaN
+MIN_NGRAMS = 20
+
+
+class EntropyProfile(NamedTuple):
+    """Entropies in bits, one row per group; NaN where the data run out.
+
+    block[:, n-1]       H_n, entropy of n-character blocks, n = 1..N+1
+    conditional[:, n-1] H(char | previous n chars), n = 1..N, measured on the
+                        (n+1)-grams themselves: H(n+1-grams) - H(their n-char prefixes)
+    rate[:, n-1]        H_n / n, n = 1..N+1
+    ngrams[:, n-1]      number of n-grams each block entropy was measured on
+    """
+    block: np.ndarray
+    conditional: np.ndarray
+    rate: np.ndarray
+    ngrams: np.ndarray
+
+
+def _grouped_entropy(key, base, num_groups):
+    """Plug-in entropy (bits) and sample size per group of codes key = group * base + code."""
+    uniq, counts = np.unique(key, return_counts=True)
+    owner = uniq // base
+    counts = counts.astype(float)
+    totals = np.bincount(owner, weights=counts, minlength=num_groups)
+    clogc = np.bincount(owner, weights=counts * np.log2(counts), minlength=num_groups)
+    entropy = np.zeros(num_groups)
+    nonzero = totals > 0
+    entropy[nonzero] = np.log2(totals[nonzero]) - clogc[nonzero] / totals[nonzero]
+    return entropy, totals.astype(np.int64)
+
+
+def _ngram_orders(codes, groups, segments, max_order, num_groups):
+    """
+    Yield (n, k, group ids, n-gram codes) for n = 1..max_order, one entry per
+    n-gram that stays inside its segment.
+    """
+    codes = np.asarray(codes)
+    groups = np.asarray(groups, dtype=np.int64)
+    segments = np.asarray(segments)
+
+    symbols, x = np.unique(codes, return_inverse=True)
+    k = max(len(symbols), 1)
+    if num_groups * float(k) ** max_order >= 2 ** 63:
+        raise ValueError(f"{num_groups} groups x {k}^{max_order} n-gram codes overflow int64")
+
+    gram = x.astype(np.int64)
+    for n in range(1, max_order + 1):
+        if n > 1:
+            # Roll the (n-1)-gram starting at i forward by one symbol
+            gram = gram[:-1] * k + x[n - 1:]
+        m = len(gram)
+        if m == 0:
+            return
+        valid = segments[:m] == segments[n - 1:n - 1 + m]
+        yield n, k, groups[:m][valid], gram[valid]
+
+
+def _num_groups(groups, num_groups):
+    if num_groups is None:
+        groups = np.asarray(groups)
+        num_groups = int(groups.max()) + 1 if len(groups) else 0
+    return num_groups
+
+
+def block_entropies(codes, groups, segments, max_order, num_groups=None):
+    """
+    Block entropies H_1..H_max_order for every group in one pass.
+
+    Args:
+        codes: Integer symbol per position
+        groups: Group id per position (non-negative ints)
+        segments: Segment id per position; segments must be contiguous and
+                  nested inside groups (e.g. lines inside folios)
+        max_order: Largest n-gram order
+        num_groups: Number of groups (default: groups.max() + 1)
+
+    Returns:
+        (block, ngrams): float array (groups, max_order) of entropies in bits
+        (NaN where a group has no n-grams of that order) and int array of
+        n-gram counts per group and order
+    """
+    num_groups = _num_groups(groups, num_groups)
+    block = np.full((num_groups, max_order), np.nan)
+    ngrams = np.zeros((num_groups, max_order), dtype=np.int64)
+    for n, k, owner, gram in _ngram_orders(codes, groups, segments, max_order, num_groups):
+        entropy, totals = _grouped_entropy(owner * (k ** n) + gram, k ** n, num_groups)
+        block[:, n - 1] = np.where(totals > 0, entropy, np.nan)
+        ngrams[:, n - 1] = totals
+    return block, ngrams
+
+
+def conditional_entropies(codes, groups, segments, max_order, num_groups=None, min_ngrams=MIN_NGRAMS):
+    """
+    H(char | previous n chars) for n = 1..max_order, every group in one pass.
+
+    Each order is measured on one sample, the (n+1)-grams, as the entropy of
+    those grams minus the entropy of their n-character prefixes. Unlike
+    H_{n+1} - H_n, whose two terms come from different samples, this is never
+    negative; sparse orders just drift towards zero. Groups with fewer than
+    min_ngrams (n+1)-grams get NaN rather than a number nobody should trust.
+
+    Returns:
+        (groups, max_order) float array in bits
+    """
+    num_groups = _num_groups(groups, num_groups)
+    conditional = np.full((num_groups, max_order), np.nan)
+    for n, k, owner, gram in _ngram_orders(codes, groups, segments, max_order + 1, num_groups):
+        if n == 1:
+            continue
+        joint, totals = _grouped_entropy(owner * (k ** n) + gram, k ** n, num_groups)
+        prefix, _ = _grouped_entropy(owner * (k ** (n - 1)) + gram // k, k ** (n - 1), num_groups)
+        enough = totals >= max(min_ngrams, 1)
+        conditional[enough, n - 2] = np.maximum(joint - prefix, 0.0)[enough]
+    return conditional
+
+
+def entropy_profile(codes, groups, segments, max_order=5, num_groups=None, min_ngrams=MIN_NGRAMS):
+    """Block, conditional and rate entropy curves for n = 1..max_order."""
+    block, ngrams = block_entropies(codes, groups, segments, max_order + 1, num_groups)
+    orders = np.arange(1, max_order + 2)
+    return EntropyProfile(
+        block=block,
+        conditional=conditional_entropies(codes, groups, segments, max_order, num_groups, min_ngrams),
+        rate=block / orders,
+        ngrams=ngrams,
+    )
+
+
+def corpus_char_positions(corpus, char_mask=None):
+    """Character codes with their line and folio ids, optionally masked.
+
+    char_mask is a boolean mask over the alphabet; unmasked characters are
+    dropped without splitting the line they sit on.
+    """
+    chars = np.asarray(corpus.chars)
+    line_lengths = np.diff(corpus.line_char_offsets)
+    line_ids = np.repeat(np.arange(len(line_lengths)), line_lengths)
+    folio_of_line = np.repeat(np.arange(len(corpus.folios)), np.diff(corpus.folio_line_offsets))
+    if char_mask is not None:
+        keep = char_mask[chars]
+        chars, line_ids = chars[keep], line_ids[keep]
+    return chars, line_ids, folio_of_line[line_ids]
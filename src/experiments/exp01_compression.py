@@ -10,10 +10,8 @@ Spoiler: they're all equally incomprehensible, but in *measurably different ways
 
 import json
 import gzip
-import math
 import os
 import sys
-from collections import Counter
 from pathlib import Path
 
 import matplotlib
@@ -22,19 +20,37 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent))
-from parse_eva import parse_transcription, get_sections, tokenize, folio_number
+from compression_profile import CODECS, compression_profile
+from corpus import Corpus, corpus_key
+from entropy import MIN_NGRAMS, corpus_char_positions, entropy_profile
+from folio_index import FolioIndex
+from pipeline import Pipeline
+
+# Annotation characters stripped before character-level analysis
+ANNOTATION_CHARS = '=-›šºg¹¤×ã¢éèúÐÙ#!?&%+@()*\n'
 
 TRANSCRIPTION = Path(__file__).parents[2] / 'data/raw/transcriptions/eva/v101-claston.txt'
 OUTPUT_DIR = Path(__file__).parents[2] / 'experiments/01-compression'
 
+# Conditional entropy H(char | previous n chars) is reported for n = 1..MAX_ORDER
+MAX_ORDER = 5
 
-def shannon_entropy(text):
-    """Character-level Shannon entropy in bits."""
-    if not text:
+# Sliding-window compression profile (characters)
+PROFILE_WINDOW = 2000
+PROFILE_STRIDE = 250
+# zlib reads the text once and reports each window's marginal cost; bz2 and
+# lzma cannot share prefix state, so their windows are compressed standalone
+PROFILE_MODES = {'zlib': 'stream', 'bz2': 'window', 'lzma': 'window'}
+
+
+def shannon_entropy_counts(counts):
+    """Shannon entropy in bits of a frequency vector (zeros ignored)."""
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if total == 0:
         return 0.0
-    counts = Counter(text)
-    total = len(text)
-    return -sum((c/total) * math.log2(c/total) for c in counts.values())
+    p = counts[counts > 0] / total
+    return float(-(p * np.log2(p)).sum())
 
 
 def gzip_compression_ratio(text):
@@ -46,54 +62,111 @@ def gzip_compression_ratio(text):
     return len(compressed) / len(raw)
 
 
-def type_token_ratio(tokens):
-    """Unique tokens / total tokens."""
-    if not tokens:
-        return 0.0
-    return len(set(tokens)) / len(tokens)
+def char_frequency_codes(corpus, chars):
+    """Character frequency distribution from character codes.
 
+    Ordered like Counter.most_common: by count, then first occurrence.
+    """
+    counts = corpus.char_counts(chars)
+    present, first_seen = np.unique(chars, return_index=True)
+    order = np.lexsort((first_seen, -counts[present]))
+    total = len(chars)
+    return {str(corpus.alphabet[c]): int(counts[c]) / total for c in present[order]}
 
-def avg_word_length(tokens):
-    """Mean token length."""
-    if not tokens:
-        return 0.0
-    return np.mean([len(t) for t in tokens])
 
+def analyze_section(section_name, corpus, folio_indices):
+    """Compute all metrics for a section."""
+    line_ranges = corpus.line_ranges(folio_indices)
+    chars = corpus.chars_in(line_ranges)
+    tokens = corpus.tokens_in(line_ranges)
 
-def char_frequency(text):
-    """Character frequency distribution."""
-    counts = Counter(text)
-    total = len(text)
-    return {ch: count/total for ch, count in counts.most_common()}
+    # Strip annotation characters for cleaner analysis
+    annotation = corpus.char_mask(lambda c: c in ANNOTATION_CHARS)
+    clean_chars = chars[~annotation[chars]]
+    clean_text = corpus.decode_chars(clean_chars)
 
+    num_tokens = len(tokens)
+    unique_tokens = len(corpus.token_set(tokens))
+    avg_len = float(corpus.token_lengths[tokens].mean()) if num_tokens else 0.0
 
-def analyze_section(section_name, pages):
-    """Compute all metrics for a section."""
-    # Combine all text
-    all_lines = []
-    for folio in sorted(pages.keys(), key=folio_number):
-        all_lines.extend(pages[folio])
-    
-    text = '\n'.join(all_lines)
-    # Strip annotation characters for cleaner analysis
-    import re
-    clean_text = re.sub(r'[=\-›šºg¹¤×ã¢éèúÐÙ#!?&%+@()*\n]', '', text)
-    
-    tokens = tokenize(text)
-    
     return {
         'section': section_name,
-        'num_pages': len(pages),
-        'num_lines': len(all_lines),
-        'total_chars': len(clean_text),
-        'total_tokens': len(tokens),
-        'unique_tokens': len(set(tokens)),
-        'shannon_entropy': round(shannon_entropy(clean_text), 4),
+        'num_pages': len(folio_indices),
+        'num_lines': sum(hi - lo for lo, hi in line_ranges),
+        'total_chars': len(clean_chars),
+        'total_tokens': num_tokens,
+        'unique_tokens': unique_tokens,
+        'shannon_entropy': round(shannon_entropy_counts(corpus.char_counts(clean_chars)), 4),
         'gzip_ratio': round(gzip_compression_ratio(clean_text), 4),
-        'type_token_ratio': round(type_token_ratio(tokens), 4),
-        'avg_word_length': round(avg_word_length(tokens), 4),
-        'char_freq_top20': dict(list(char_frequency(clean_text).items())[:20]),
+        'type_token_ratio': round(unique_tokens / num_tokens if num_tokens else 0.0, 4),
+        'avg_word_length': round(avg_len, 4),
+        'char_freq_top20': dict(list(char_frequency_codes(corpus, clean_chars).items())[:20]),
+    }
+
+
+def entropy_profiles(corpus, index, max_order=MAX_ORDER):
+    """N-gram entropy curves for every section and every folio in one pass each.
+
+    Uses the same annotation-stripped characters as the unigram entropy;
+    n-grams do not cross line boundaries.
+    """
+    annotation = corpus.char_mask(lambda c: c in ANNOTATION_CHARS)
+    chars, line_ids, folio_ids = corpus_char_positions(corpus, ~annotation)
+    
+    section_names = index.groups('section')
+    folio_section = np.array([section_names.index(s) for s in index.labels['section']])
+    by_section = entropy_profile(chars, folio_section[folio_ids], line_ids, max_order,
+                                 num_groups=len(section_names))
+    by_folio = entropy_profile(chars, folio_ids, line_ids, max_order, num_groups=len(corpus.folios))
+    
+    sections = {name: _profile_row(by_section, i) for i, name in enumerate(section_names)}
+    folios = {
+        folio: dict(section=index.labels['section'][i], **_profile_row(by_folio, i))
+        for i, folio in enumerate(corpus.folios)
     }
+    return sections, folios
+
+
+def _rounded(values):
+    """Rounded floats for JSON, with None where the estimate is NaN."""
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+
+def _profile_row(profile, i):
+    return {
+        'conditional_entropy': _rounded(profile.conditional[i]),
+        'entropy_rate': _rounded(profile.rate[i]),
+    }
+
+
+def plot_entropy_profiles(results, output_dir):
+    """Conditional entropy and entropy rate curves per section."""
+    section_results = [r for r in results if r['section'] != 'other']
+    colors = ['#2ecc71', '#3498db', '#e74c3c', '#f39c12', '#9b59b6']
+    
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    fig.suptitle('N-gram Entropy by Section\n(Watching the uncertainty drain away, one character of context at a time)',
+                 fontsize=13, style='italic')
+    
+    for color, r in zip(colors, section_results):
+        cond = np.array(r['conditional_entropy'], dtype=float)
+        rate = np.array(r['entropy_rate'], dtype=float)
+        ax1.plot(range(1, len(cond) + 1), cond, 'o-', color=color, label=r['section'])
+        ax2.plot(range(1, len(rate) + 1), rate, 'o-', color=color, label=r['section'])
+    
+    ax1.set_xlabel('Context length n')
+    ax1.set_ylabel('H(char | previous n chars) (bits)')
+    ax1.set_title('Conditional Entropy')
+    ax2.set_xlabel('Block length n')
+    ax2.set_ylabel('H_n / n (bits)')
+    ax2.set_title('Block Entropy Rate')
+    for ax in (ax1, ax2):
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+    
+    plt.tight_layout()
+    plt.savefig(output_dir / 'entropy_profiles.png', dpi=150, bbox_inches='tight')
+    plt.close()
 
 
 def plot_results(results, output_dir):
@@ -147,27 +220,131 @@ def plot_results(results, output_dir):
     plt.close()
 
 
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    pages = parse_transcription(TRANSCRIPTION)
-    sections = get_sections(pages)
+def compute_results():
+    """Per-section metrics plus per-folio entropy curves."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    section_profiles, folio_profiles = entropy_profiles(corpus, index)
     
     results = []
     for section_name in ['botanical', 'astronomical', 'biological', 'pharmaceutical', 'other']:
-        if section_name in sections:
-            r = analyze_section(section_name, sections[section_name])
+        folio_indices = index.folios_in('section', section_name)
+        if len(folio_indices):
+            r = analyze_section(section_name, corpus, folio_indices)
+            r.update(section_profiles[section_name])
             results.append(r)
-            print(f"  {section_name}: entropy={r['shannon_entropy']}, gzip={r['gzip_ratio']}, TTR={r['type_token_ratio']}, avg_len={r['avg_word_length']}")
-    
-    # Save results
-    with open(OUTPUT_DIR / 'results.json', 'w') as f:
+    return results, folio_profiles
+
+
+def save_results(computed, output_dir=OUTPUT_DIR):
+    results, folio_profiles = computed
+    with open(output_dir / 'results.json', 'w') as f:
         json.dump(results, f, indent=2)
+    with open(output_dir / 'folio_entropy.json', 'w') as f:
+        json.dump(folio_profiles, f, indent=2)
+    return results
+
+
+def plot_all(results, output_dir=OUTPUT_DIR):
+    plot_results(results, output_dir)
+    plot_entropy_profiles(results, output_dir)
+
+
+def compute_compression_profile(window=PROFILE_WINDOW, stride=PROFILE_STRIDE):
+    """Windowed compression ratios along the manuscript, in folio order, per codec."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    annotation = corpus.char_mask(lambda c: c in ANNOTATION_CHARS)
+    chars, _, folio_ids = corpus_char_positions(corpus, ~annotation)
+    # One byte per character: the alphabet codes of the cleaned text
+    if len(chars) and chars.max() >= 256:
+        raise ValueError(f"Alphabet has {int(chars.max()) + 1} symbols; byte codes only hold 256")
+    data = chars.astype(np.uint8).tobytes()
+
+    profiles = {codec: compression_profile(data, window, stride, codec, PROFILE_MODES[codec])
+                for codec in CODECS}
+    centers = profiles['zlib'].starts + window // 2
+    # Character offset where each section run begins, for shading the plot
+    section_starts = []
+    for name in index.groups('section'):
+        for lo, hi in index.line_ranges('section', name):
+            first_folio = np.searchsorted(corpus.folio_line_offsets, lo, side='right') - 1
+            section_starts.append((int(np.searchsorted(folio_ids, first_folio)), name))
+    return {
+        'window': window,
+        'stride': stride,
+        'modes': {codec: p.mode for codec, p in profiles.items()},
+        'centers': centers,
+        'folios': [corpus.folios[i] for i in folio_ids[centers]] if len(centers) else [],
+        'ratios': {codec: p.ratios for codec, p in profiles.items()},
+        'section_starts': sorted(section_starts),
+    }
+
+
+def save_compression_profile(profile, output_dir=OUTPUT_DIR):
+    with open(output_dir / 'compression_profile.json', 'w') as f:
+        json.dump({
+            'window': profile['window'],
+            'stride': profile['stride'],
+            'modes': profile['modes'],
+            'center': profile['centers'].tolist(),
+            'folio': profile['folios'],
+            'ratios': {codec: [round(float(r), 4) for r in ratios] for codec, ratios in profile['ratios'].items()},
+        }, f, indent=2)
+
+
+def plot_compression_profile(profile, output_dir=OUTPUT_DIR):
+    """Windowed compression ratio curves with section boundaries marked."""
+    colors = {'zlib': '#3498db', 'bz2': '#e74c3c', 'lzma': '#2ecc71'}
+    fig, ax = plt.subplots(figsize=(16, 6))
+    for codec, ratios in profile['ratios'].items():
+        label = f"{codec} (marginal)" if profile['modes'][codec] == 'stream' else codec
+        ax.plot(profile['centers'], ratios, color=colors.get(codec), linewidth=1, label=label)
+    for offset, name in profile['section_starts']:
+        ax.axvline(offset, color='gray', linestyle=':', linewidth=0.8)
+        ax.text(offset, ax.get_ylim()[1], f' {name}', rotation=90, va='top', fontsize=8, color='gray')
+    ax.set_xlabel(f"Character offset (folio order; window={profile['window']}, stride={profile['stride']})")
+    ax.set_ylabel('Compression Ratio')
+    ax.set_title('Compression Ratio Along the Manuscript\n'
+                 '(A seismograph of redundancy. Nothing ever quite erupts.)', fontsize=11, style='italic')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(output_dir / 'compression_profile.png', dpi=150, bbox_inches='tight')
+    plt.close()
+
+
+def report_compression_profile(profile, output_dir=OUTPUT_DIR):
+    save_compression_profile(profile, output_dir)
+    plot_compression_profile(profile, output_dir)
+
+
+def build_pipeline(output_dir=OUTPUT_DIR):
+    """Experiment 1 as memoized stages; see pipeline.py."""
+    pipe = Pipeline('exp01_compression', source=corpus_key(TRANSCRIPTION))
+    pipe.add('metrics', compute_results)
+    pipe.add('results', save_results, inputs=['metrics'], params={'output_dir': output_dir},
+             outputs=[output_dir / 'results.json', output_dir / 'folio_entropy.json'])
+    pipe.add('plots', plot_all, inputs=['results'], params={'output_dir': output_dir},
+             outputs=[output_dir / name for name in
+                      ('compression_comparison.png', 'char_frequencies.png', 'entropy_profiles.png')])
+    pipe.add('profile', compute_compression_profile,
+             params={'window': PROFILE_WINDOW, 'stride': PROFILE_STRIDE})
+    pipe.add('profile_report', report_compression_profile, inputs=['profile'],
+             params={'output_dir': output_dir},
+             outputs=[output_dir / 'compression_profile.json', output_dir / 'compression_profile.png'])
+    pipe.add('analysis', write_analysis, inputs=['results'], params={'output_dir': output_dir},
+             outputs=[output_dir / 'analysis.md'])
+    return pipe
+
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    plot_results(results, OUTPUT_DIR)
+    values, _ = build_pipeline().run()
+    for r in values['results']:
+        print(f"  {r['section']}: entropy={r['shannon_entropy']}, gzip={r['gzip_ratio']}, TTR={r['type_token_ratio']}, avg_len={r['avg_word_length']}")
     
-    # Write analysis
-    write_analysis(results, OUTPUT_DIR)
     print(f"\nResults written to {OUTPUT_DIR}")
 
 
@@ -213,6 +390,16 @@ The **{min_gz}** section compresses best (ratio {gzips[min_gz]:.4f}) while **{ma
     min_ttr = min(ttrs, key=ttrs.get)
     md += f"""The **{max_ttr}** section has the richest vocabulary relative to its size (TTR={ttrs[max_ttr]:.4f}), while **{min_ttr}** is the most repetitive (TTR={ttrs[min_ttr]:.4f}). Note that TTR is size-dependent — larger sections naturally have lower TTR. Still, the differences here are worth noting.
 
+### Conditional Entropy
+
+| Section | """ + ' | '.join(f"H(c\\|{n})" for n in range(1, MAX_ORDER + 1)) + """ |
+|---------|""" + '|'.join('-------' for _ in range(MAX_ORDER)) + """|
+"""
+    for r in sections:
+        md += f"| {r['section']} | " + ' | '.join('—' if v is None else str(v) for v in r['conditional_entropy']) + " |\n"
+    md += f"""
+H(c|n) is the entropy of the next character given the previous n characters on the same line. A fast drop with n means strongly predictable character sequences; per-folio curves are in `folio_entropy.json`. The longer contexts are estimated from increasingly sparse n-gram counts, so treat the tail of the curve for small sections (astronomical especially) with the suspicion it deserves. Each H(c|n) is measured on the (n+1)-grams alone, so it cannot go negative, and orders with fewer than {MIN_NGRAMS} of them are left blank (—).
+
 ### What This Means
 
 The sections *are* statistically distinguishable. They have different compression profiles, different entropy levels, different vocabulary densities. This is consistent with — though not proof of — different content types. It's also consistent with different scribes, different encoding rules, or just different moods of the hoaxer on different days.
@@ -223,6 +410,8 @@ But the fact remains: the sections aren't uniform noise. They have *structure*.
 
 ![Compression Comparison](compression_comparison.png)
 ![Character Frequencies](char_frequencies.png)
+![Entropy Profiles](entropy_profiles.png)
+![Compression Profile](compression_profile.png)
 """
     
     with open(output_dir / 'analysis.md', 'w') as f:
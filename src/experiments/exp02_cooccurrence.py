@@ -11,121 +11,384 @@ for meaningless symbols. At least *they* have connections.
 import json
 import os
 import sys
-from collections import Counter, defaultdict
 from pathlib import Path
-from itertools import combinations
 
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
+from scipy import sparse
 
 sys.path.insert(0, str(Path(__file__).parent))
-from parse_eva import parse_transcription, get_sections, tokenize, folio_number
+from association import association_matrix, top_k_per_token, window_pair_counts
+from association import top_pairs as top_association_pairs
+from community import adjusted_rand_index, louvain, normalized_mutual_info
+from corpus import Corpus, corpus_key, difference_sorted, intersect_sorted, union_sorted
+from folio_index import FolioIndex
+from pipeline import Pipeline
+from similarity import jaccard_matrix, minhash_signatures, near_duplicates, sets_to_incidence
 
 TRANSCRIPTION = Path(__file__).parents[2] / 'data/raw/transcriptions/eva/v101-claston.txt'
 OUTPUT_DIR = Path(__file__).parents[2] / 'experiments/02-cooccurrence'
+# Full-vocabulary co-occurrence matrices are too big to commit with the results
+MATRIX_DIR = Path(__file__).parents[2] / 'data/derived/cache/cooccurrence'
+
+# Folio pairs at least this similar are reported as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.2
+
+# Within-line association: largest token distances, and the minimum pair count scored
+ASSOCIATION_WINDOWS = (1, 3)
+ASSOCIATION_MIN_COUNT = 5
+
+GRANULARITIES = ('page', 'line')
+WEIGHTINGS = ('binary', 'count', 'log', 'idf')
 
 
 def jaccard_similarity(set_a, set_b):
-    if not set_a and not set_b:
+    """Jaccard similarity of two sorted unique token id arrays."""
+    if not len(set_a) and not len(set_b):
         return 0.0
-    intersection = set_a & set_b
-    union = set_a | set_b
-    return len(intersection) / len(union) if union else 0.0
-
-
-def build_page_token_sets(pages):
-    """For each page, get the set of tokens."""
-    page_tokens = {}
-    for folio, lines in pages.items():
-        text = '\n'.join(lines)
-        tokens = tokenize(text)
-        if tokens:
-            page_tokens[folio] = set(tokens)
-    return page_tokens
-
-
-def build_cooccurrence(page_tokens, top_n=100):
-    """Build token co-occurrence from page-level co-occurrence."""
-    # Get most common tokens
-    all_tokens = Counter()
-    for tokens in page_tokens.values():
-        all_tokens.update(tokens)
-    
-    top_tokens = [t for t, _ in all_tokens.most_common(top_n)]
-    top_set = set(top_tokens)
-    
-    cooccurrence = Counter()
-    for folio, tokens in page_tokens.items():
-        page_top = tokens & top_set
-        for a, b in combinations(sorted(page_top), 2):
-            cooccurrence[(a, b)] += 1
-    
-    return top_tokens, cooccurrence
+    intersection = intersect_sorted(set_a, set_b)
+    union = union_sorted(set_a, set_b)
+    return len(intersection) / len(union) if len(union) else 0.0
+
+
+def unit_ids(corpus, granularity='page'):
+    """Row (page or line) of every token in corpus.tokens, and the row count."""
+    line_ids = np.repeat(np.arange(corpus.num_lines), np.diff(corpus.line_token_offsets))
+    if granularity == 'line':
+        return line_ids, corpus.num_lines
+    if granularity == 'page':
+        folio_of_line = np.repeat(np.arange(len(corpus.folios)), np.diff(corpus.folio_line_offsets))
+        return folio_of_line[line_ids], len(corpus.folios)
+    raise ValueError(f"Unknown granularity: {granularity}. Choose from {GRANULARITIES}")
+
+
+def incidence_matrix(corpus, granularity='page', weighting='binary'):
+    """
+    Sparse unit x token matrix over the full vocabulary.
+
+    Args:
+        corpus: Corpus
+        granularity: 'page' (one row per folio) or 'line'
+        weighting: 'binary' (presence), 'count', 'log' (1 + log count)
+                   or 'idf' (presence x log(units / units containing token))
+
+    Returns:
+        CSR matrix of shape (units, len(corpus.vocab)), sorted indices
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting: {weighting}. Choose from {WEIGHTINGS}")
+    rows, num_units = unit_ids(corpus, granularity)
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, np.asarray(corpus.tokens))),
+        shape=(num_units, len(corpus.vocab)))
+    counts.sum_duplicates()
+    matrix = counts.copy()
+    if weighting == 'binary':
+        matrix.data[:] = 1
+    elif weighting == 'log':
+        matrix.data = 1 + np.log(matrix.data)
+    elif weighting == 'idf':
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        idf = np.log(num_units / np.maximum(df, 1))
+        matrix.data = idf[matrix.indices]
+    return matrix
+
+
+def build_cooccurrence(incidence):
+    """
+    Token x token co-occurrence X^T X of an incidence matrix.
+
+    With binary weighting entry (a, b) is the number of units holding both
+    tokens, and the diagonal is each token's unit frequency.
+    """
+    return (incidence.T @ incidence).tocsr()
+
+
+def top_pairs(cooccurrence, k=20):
+    """The k largest off-diagonal entries as (a, b, value), a < b."""
+    upper = sparse.triu(cooccurrence, k=1).tocoo()
+    if upper.nnz == 0:
+        return []
+    k = min(k, upper.nnz)
+    best = np.argpartition(-upper.data, k - 1)[:k]
+    # Largest first; ties broken by token ids so the order is stable
+    best = best[np.lexsort((upper.col[best], upper.row[best], -upper.data[best]))]
+    return list(zip(upper.row[best].tolist(), upper.col[best].tolist(), upper.data[best].tolist()))
+
+
+def save_cooccurrence(cooccurrence, granularity, weighting, matrix_dir=MATRIX_DIR):
+    """Store a co-occurrence matrix as <granularity>-<weighting>.npz."""
+    matrix_dir = Path(matrix_dir)
+    matrix_dir.mkdir(parents=True, exist_ok=True)
+    path = matrix_dir / f"{granularity}-{weighting}.npz"
+    sparse.save_npz(path, cooccurrence)
+    return path
+
+
+def load_cooccurrence(granularity='page', weighting='binary', matrix_dir=MATRIX_DIR):
+    return sparse.load_npz(Path(matrix_dir) / f"{granularity}-{weighting}.npz")
+
+
+def compute_cooccurrence(weighting='binary'):
+    """Page and line co-occurrence matrices for the full vocabulary."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    return {granularity: build_cooccurrence(incidence_matrix(corpus, granularity, weighting))
+            for granularity in GRANULARITIES}
+
+
+def summarize_cooccurrence(matrices, weighting='binary', matrix_dir=MATRIX_DIR):
+    """Save the matrices and report their size and strongest pairs."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    summary = {}
+    for granularity, cooccurrence in matrices.items():
+        save_cooccurrence(cooccurrence, granularity, weighting, matrix_dir)
+        summary[granularity] = {
+            'vocabulary': cooccurrence.shape[0],
+            'cooccurring_pairs': int(sparse.triu(cooccurrence, k=1).nnz),
+            'top_pairs': [
+                [str(corpus.vocab[a]), str(corpus.vocab[b]), round(float(v), 4)]
+                for a, b, v in top_pairs(cooccurrence)
+            ],
+        }
+    return summary
+
+
+def folio_similarity(threshold=NEAR_DUPLICATE_THRESHOLD, num_perm=128, seed=0):
+    """Exact all-pairs folio Jaccard plus MinHash/LSH near-duplicate search."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    incidence = incidence_matrix(corpus, 'page', 'binary')
+    jaccard = jaccard_matrix(incidence, dense=True)
+    signatures = minhash_signatures(incidence, num_perm, seed)
+    return {
+        'folios': list(corpus.folios),
+        'sections': list(index.labels['section']),
+        'jaccard': jaccard,
+        'near_duplicates': near_duplicates(incidence, threshold, signatures=signatures),
+        'threshold': threshold,
+    }
+
+
+def summarize_folio_similarity(similarity, top_n=10):
+    """Within/between-section folio similarity and the closest folio pairs."""
+    jaccard = similarity['jaccard']
+    folios = similarity['folios']
+    sections = np.array(similarity['sections'])
+    nonempty = np.diag(jaccard) > 0
+    i, j = np.triu_indices(len(folios), k=1)
+    pair = nonempty[i] & nonempty[j]
+    i, j = i[pair], j[pair]
+    values = jaccard[i, j]
+    same = sections[i] == sections[j]
+
+    within = {}
+    for name in dict.fromkeys(sections.tolist()):
+        members = same & (sections[i] == name)
+        if members.any():
+            within[name] = round(float(values[members].mean()), 4)
+
+    order = np.lexsort((j, i, -values))[:top_n]
+    exact_above = int(np.count_nonzero(values >= similarity['threshold']))
+    found = similarity['near_duplicates']
+    return {
+        'mean_within_section_jaccard': round(float(values[same].mean()), 4) if same.any() else 0.0,
+        'mean_between_section_jaccard': round(float(values[~same].mean()), 4) if (~same).any() else 0.0,
+        'within_section_jaccard': within,
+        'most_similar_pairs': [[folios[a], folios[b], round(float(values[k]), 4)]
+                               for k, a, b in zip(order.tolist(), i[order].tolist(), j[order].tolist())],
+        'near_duplicates': {
+            'threshold': similarity['threshold'],
+            'exact_pairs': exact_above,
+            'lsh_pairs': len(found.left),
+            'pairs': [[folios[a], folios[b], round(float(v), 4)]
+                      for a, b, v in zip(found.left.tolist(), found.right.tolist(), found.jaccard.tolist())][:top_n],
+        },
+    }
+
+
+def plot_folio_jaccard(similarity, output_dir):
+    """Folio x folio Jaccard heatmap in manuscript order, sections marked."""
+    jaccard = similarity['jaccard'].copy()
+    np.fill_diagonal(jaccard, np.nan)
+    sections = similarity['sections']
+    boundaries = [k for k in range(1, len(sections)) if sections[k] != sections[k - 1]]
+
+    fig, ax = plt.subplots(figsize=(10, 9))
+    im = ax.imshow(jaccard, cmap='YlOrRd', vmin=0, vmax=np.nanmax(jaccard) if len(jaccard) > 1 else 1)
+    for k in boundaries:
+        ax.axhline(k - 0.5, color='black', linewidth=0.5)
+        ax.axvline(k - 0.5, color='black', linewidth=0.5)
+    starts = [0] + boundaries
+    ends = boundaries + [len(sections)]
+    ax.set_xticks([(a + b - 1) / 2 for a, b in zip(starts, ends)])
+    ax.set_xticklabels([sections[a] for a in starts], rotation=90, fontsize=7)
+    ax.set_yticks([])
+    plt.colorbar(im, label='Jaccard Similarity')
+    ax.set_title('Folio-by-Folio Token Overlap (Jaccard Similarity)\n'
+                 '(Every page politely ignoring its neighbours)', fontsize=11, style='italic')
+    plt.tight_layout()
+    plt.savefig(output_dir / 'folio_jaccard.png', dpi=150, bbox_inches='tight')
+    plt.close()
 
 
-def section_token_analysis(sections):
+def dominant_labels(corpus, index, field):
+    """
+    Label (section, Currier language) each token occurs under most often.
+
+    Tokens never seen on a labelled folio get ''.
+    """
+    counts = incidence_matrix(corpus, 'page', 'count')
+    names = index.groups(field)
+    labels = np.array(index.labels[field])
+    rows = [np.flatnonzero(labels == name) for name in names]
+    group_of_folio = sparse.csr_matrix(
+        (np.ones(sum(len(r) for r in rows)),
+         (np.concatenate(rows or [[]]), np.repeat(np.arange(len(names)), [len(r) for r in rows]))),
+        shape=(len(labels), len(names)))
+    per_group = (group_of_folio.T @ counts).toarray()
+    dominant = np.full(counts.shape[1], '', dtype=object)
+    seen = per_group.sum(axis=0) > 0
+    if names:
+        dominant[seen] = np.array(names, dtype=object)[np.argmax(per_group[:, seen], axis=0)]
+    return dominant
+
+
+def detect_communities(matrices, resolution=1.0, seed=0):
+    """Louvain communities of each co-occurrence graph, scored against sections and Currier."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    reference = {field: dominant_labels(corpus, index, field) for field in ('section', 'currier')}
+
+    results = {}
+    for granularity, cooccurrence in matrices.items():
+        partition = louvain(cooccurrence, resolution=resolution, seed=seed)
+        # Tokens with no co-occurrence are singleton communities; leave them out of the scores
+        off_diagonal = sparse.csr_matrix(cooccurrence, copy=True)
+        off_diagonal.setdiag(0)
+        off_diagonal.eliminate_zeros()
+        connected = np.diff(off_diagonal.indptr) > 0
+        sizes = np.bincount(partition.labels[connected])
+        agreement = {}
+        for field, labels in reference.items():
+            keep = connected & (labels != '')
+            agreement[field] = {
+                'tokens': int(np.count_nonzero(keep)),
+                'nmi': round(normalized_mutual_info(partition.labels[keep], labels[keep].astype(str)), 4),
+                'ari': round(adjusted_rand_index(partition.labels[keep], labels[keep].astype(str)), 4),
+            }
+        frequency = np.diff(sparse.csc_matrix(incidence_matrix(corpus, granularity)).indptr)
+        largest = []
+        for community in np.flatnonzero(sizes)[:5].tolist():
+            members = np.flatnonzero(partition.labels == community)
+            top = members[np.argsort(-frequency[members], kind='stable')[:8]]
+            sections, counts = np.unique(reference['section'][members].astype(str), return_counts=True)
+            largest.append({
+                'size': int(len(members)),
+                'dominant_section': str(sections[np.argmax(counts)]),
+                'tokens': corpus.decode_tokens(top),
+            })
+        results[granularity] = {
+            'communities': int(np.count_nonzero(sizes)),
+            'modularity': round(partition.modularity, 4),
+            'levels': partition.levels,
+            'agreement': agreement,
+            'largest': largest,
+        }
+    return results
+
+
+def compute_association(windows=ASSOCIATION_WINDOWS, min_count=ASSOCIATION_MIN_COUNT):
+    """Windowed pair counts and NPMI / log-likelihood scores for each window."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    line_ids, _ = unit_ids(corpus, 'line')
+    results = {}
+    for window in windows:
+        counts = window_pair_counts(corpus.tokens, line_ids, len(corpus.vocab), window)
+        results[window] = {
+            'counts': counts,
+            'npmi': association_matrix(counts, 'npmi', min_count),
+            'llr': association_matrix(counts, 'llr', min_count),
+        }
+    return results
+
+
+def summarize_association(association, top_n=10, partners=5):
+    """Strongest pairs per window, and the closest partners of the commonest tokens."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    common = np.argsort(-corpus.token_counts(corpus.tokens), kind='stable')[:partners]
+    vocab = corpus.vocab
+
+    def named(pairs):
+        return [[str(vocab[a]), str(vocab[b]), round(float(v), 4)] for a, b, v in pairs]
+
+    summary = {}
+    for window, scores in association.items():
+        rows, cols, values = top_k_per_token(scores['npmi'], k=partners)
+        summary[f"window_{window}"] = {
+            'pairs': int(scores['counts'].sum()),
+            'distinct_pairs': int(scores['counts'].nnz),
+            'scored_pairs': int(scores['npmi'].nnz),
+            'top_npmi': named(top_association_pairs(scores['npmi'], top_n)),
+            'top_llr': named(top_association_pairs(scores['llr'], top_n)),
+            'partners': {
+                str(vocab[t]): named(zip(rows[rows == t], cols[rows == t], values[rows == t]))
+                for t in common.tolist()
+            },
+        }
+    return summary
+
+
+def section_token_sets(corpus, index):
+    """Sorted token id arrays per section, in order of first appearance."""
+    return {name: corpus.token_set(index.tokens('section', name)) for name in index.groups('section')}
+
+
+def section_token_analysis(corpus, token_sets):
     """Analyze within/between section token overlap."""
-    section_token_sets = {}
-    for section_name, pages in sections.items():
-        all_tokens = set()
-        for lines in pages.values():
-            all_tokens.update(tokenize('\n'.join(lines)))
-        section_token_sets[section_name] = all_tokens
-    
     # Within-section: average Jaccard between pages in same section
     # Between-section: Jaccard between section vocabularies
-    section_names = sorted(section_token_sets.keys())
+    section_names = sorted(token_sets.keys())
     
     between_jaccard = {}
     for i, s1 in enumerate(section_names):
         for s2 in section_names[i+1:]:
-            j = jaccard_similarity(section_token_sets[s1], section_token_sets[s2])
+            j = jaccard_similarity(token_sets[s1], token_sets[s2])
             between_jaccard[f"{s1}-{s2}"] = round(j, 4)
     
     # Section-specific tokens
     section_specific = {}
-    all_sections_tokens = {s: t for s, t in section_token_sets.items()}
-    
     for section in section_names:
-        others = set()
-        for s, t in all_sections_tokens.items():
-            if s != section:
-                others.update(t)
-        unique = section_token_sets[section] - others
-        section_specific[section] = sorted(unique)[:50]  # top 50
+        others = np.unique(np.concatenate(
+            [t for s, t in token_sets.items() if s != section] or [np.empty(0, dtype=np.int32)]))
+        unique = difference_sorted(token_sets[section], others)
+        section_specific[section] = unique[:50]  # top 50
     
     # Universal tokens (in all sections)
-    if section_token_sets:
-        universal = set.intersection(*section_token_sets.values())
-    else:
-        universal = set()
+    universal = np.empty(0, dtype=np.int32)
+    if token_sets:
+        universal = token_sets[section_names[0]]
+        for s in section_names[1:]:
+            universal = intersect_sorted(universal, token_sets[s])
     
+    # Vocabulary ids are sorted like their strings, so id order is string order
     return {
-        'section_vocab_sizes': {s: len(t) for s, t in section_token_sets.items()},
+        'section_vocab_sizes': {s: len(t) for s, t in token_sets.items()},
         'between_section_jaccard': between_jaccard,
-        'section_specific_tokens': {s: {'count': len(v), 'examples': v[:30]} for s, v in section_specific.items()},
-        'universal_tokens': {'count': len(universal), 'tokens': sorted(universal)[:50]},
+        'section_specific_tokens': {
+            s: {'count': len(v), 'examples': corpus.decode_tokens(v[:30])}
+            for s, v in section_specific.items()
+        },
+        'universal_tokens': {'count': len(universal), 'tokens': corpus.decode_tokens(universal[:50])},
     }
 
 
-def plot_jaccard_matrix(sections, output_dir):
+def plot_jaccard_matrix(token_sets, output_dir):
     """Plot section similarity heatmap."""
-    section_token_sets = {}
-    for section_name, pages in sections.items():
-        all_tokens = set()
-        for lines in pages.values():
-            all_tokens.update(tokenize('\n'.join(lines)))
-        section_token_sets[section_name] = all_tokens
-    
-    names = sorted(section_token_sets.keys())
+    names = sorted(token_sets.keys())
     n = len(names)
-    matrix = np.zeros((n, n))
-    
-    for i in range(n):
-        for j in range(n):
-            matrix[i][j] = jaccard_similarity(section_token_sets[names[i]], section_token_sets[names[j]])
+    matrix = jaccard_matrix(sets_to_incidence([token_sets[name] for name in names]), dense=True)
     
     fig, ax = plt.subplots(figsize=(8, 7))
     im = ax.imshow(matrix, cmap='YlOrRd', vmin=0, vmax=1)
@@ -174,6 +437,10 @@ def write_analysis(analysis, output_dir):
     jaccard = analysis['between_section_jaccard']
     specific = analysis['section_specific_tokens']
     universal = analysis['universal_tokens']
+    cooccurrence = analysis.get('cooccurrence', {})
+    folio = analysis.get('folio_similarity')
+    communities = analysis.get('communities', {})
+    association = analysis.get('association', {})
     
     md = """# Experiment 2: Token Co-occurrence Networks
 
@@ -218,7 +485,82 @@ Tokens appearing across ALL sections: **{universal['count']}**
 
 Examples: {', '.join(universal['tokens'][:30])}
 
-## Interpretation
+## Strongest Co-occurrences
+
+Full-vocabulary co-occurrence, counted as the number of pages (or lines) on which both tokens appear.
+
+"""
+    for granularity, summary in cooccurrence.items():
+        md += f"""### {granularity.title()} level
+
+{summary['cooccurring_pairs']:,} co-occurring pairs over a vocabulary of {summary['vocabulary']:,} tokens.
+
+| Token A | Token B | {granularity.title()}s |
+|---------|---------|-------|
+"""
+        for a, b, count in summary['top_pairs'][:10]:
+            md += f"| {a} | {b} | {count:g} |\n"
+        md += "\n"
+
+    if folio:
+        near = folio['near_duplicates']
+        md += f"""## Folio-Level Similarity
+
+Exact Jaccard similarity between every pair of folios.
+
+- Mean within-section Jaccard: **{folio['mean_within_section_jaccard']}**
+- Mean between-section Jaccard: **{folio['mean_between_section_jaccard']}**
+
+| Folio A | Folio B | Jaccard |
+|---------|---------|---------|
+"""
+        for a, b, j in folio['most_similar_pairs']:
+            md += f"| {a} | {b} | {j} |\n"
+        md += f"""
+MinHash/LSH search for folios with Jaccard >= {near['threshold']} found {near['lsh_pairs']} of the {near['exact_pairs']} pairs the exact computation finds.
+
+"""
+
+    if communities:
+        md += """## Token Communities
+
+Louvain modularity communities of the co-occurrence graphs, compared with each token's dominant section and Currier language (NMI: 0 = unrelated, 1 = identical; ARI: 0 = chance).
+
+| Graph | Communities | Modularity | NMI (section) | ARI (section) | NMI (Currier) | ARI (Currier) |
+|-------|-------------|-----------|---------------|---------------|---------------|---------------|
+"""
+        for granularity, c in communities.items():
+            section, currier = c['agreement']['section'], c['agreement']['currier']
+            md += (f"| {granularity} | {c['communities']} | {c['modularity']} | {section['nmi']} | "
+                   f"{section['ari']} | {currier['nmi']} | {currier['ari']} |\n")
+        md += "\n"
+        for granularity, c in communities.items():
+            md += f"Largest {granularity}-level communities:\n\n"
+            for community in c['largest']:
+                md += (f"- {community['size']} tokens, mostly {community['dominant_section']}: "
+                       f"{', '.join(community['tokens'])}\n")
+            md += "\n"
+
+    if association:
+        md += """## Within-Line Association
+
+Token pairs up to *w* tokens apart on the same line, scored by normalised PMI (-1 to 1) and signed log-likelihood (G²). Only pairs seen at least """ + f"{ASSOCIATION_MIN_COUNT}" + """ times are scored.
+
+"""
+        for name, a in association.items():
+            window = name.split('_')[1]
+            md += f"""### w = {window}
+
+{a['pairs']:,} pairs ({a['distinct_pairs']:,} distinct, {a['scored_pairs']:,} scored).
+
+| Token A | Token B | NPMI | | Token A | Token B | G² |
+|---------|---------|------|-|---------|---------|----|
+"""
+            for (a1, b1, v1), (a2, b2, v2) in zip(a['top_npmi'], a['top_llr']):
+                md += f"| {a1} | {b1} | {v1} | | {a2} | {b2} | {v2} |\n"
+            md += "\n"
+
+    md += f"""## Interpretation
 
 *Brace yourselves for insights that change nothing.*
 
@@ -234,34 +576,77 @@ This pattern — shared core vocabulary plus section-specific terminology — is
 
 ![Jaccard Heatmap](jaccard_heatmap.png)
 ![Section-Specific Tokens](section_specific_tokens.png)
+![Folio Jaccard](folio_jaccard.png)
 """
     
     with open(output_dir / 'analysis.md', 'w') as f:
         f.write(md)
 
 
+def compute_analysis():
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    token_sets = section_token_sets(corpus, index)
+    return section_token_analysis(corpus, token_sets), token_sets
+
+
+def save_results(computed, cooccurrence, folio_summary, communities, association,
+                 output_dir=OUTPUT_DIR):
+    analysis, _ = computed
+    analysis = dict(analysis, cooccurrence=cooccurrence, folio_similarity=folio_summary,
+                    communities=communities, association=association)
+    with open(output_dir / 'results.json', 'w') as f:
+        json.dump(analysis, f, indent=2)
+    return analysis
+
+
+def plot_all(computed, output_dir=OUTPUT_DIR):
+    analysis, token_sets = computed
+    plot_jaccard_matrix(token_sets, output_dir)
+    plot_section_specific(analysis, output_dir)
+
+
+def build_pipeline(output_dir=OUTPUT_DIR):
+    """Experiment 2 as memoized stages; see pipeline.py."""
+    pipe = Pipeline('exp02_cooccurrence', source=corpus_key(TRANSCRIPTION))
+    pipe.add('token_analysis', compute_analysis)
+    pipe.add('cooccurrence', compute_cooccurrence, params={'weighting': 'binary'})
+    pipe.add('cooccurrence_summary', summarize_cooccurrence, inputs=['cooccurrence'],
+             params={'weighting': 'binary', 'matrix_dir': MATRIX_DIR},
+             outputs=[MATRIX_DIR / f"{g}-binary.npz" for g in GRANULARITIES])
+    pipe.add('folio_similarity', folio_similarity,
+             params={'threshold': NEAR_DUPLICATE_THRESHOLD, 'num_perm': 128, 'seed': 0})
+    pipe.add('folio_summary', summarize_folio_similarity, inputs=['folio_similarity'])
+    pipe.add('folio_plot', plot_folio_jaccard, inputs=['folio_similarity'],
+             params={'output_dir': output_dir}, outputs=[output_dir / 'folio_jaccard.png'])
+    pipe.add('communities', detect_communities, inputs=['cooccurrence'],
+             params={'resolution': 1.0, 'seed': 0})
+    pipe.add('association', compute_association,
+             params={'windows': ASSOCIATION_WINDOWS, 'min_count': ASSOCIATION_MIN_COUNT})
+    pipe.add('association_summary', summarize_association, inputs=['association'])
+    pipe.add('results', save_results,
+             inputs=['token_analysis', 'cooccurrence_summary', 'folio_summary', 'communities',
+                     'association_summary'],
+             params={'output_dir': output_dir}, outputs=[output_dir / 'results.json'])
+    pipe.add('plots', plot_all, inputs=['token_analysis'], params={'output_dir': output_dir},
+             outputs=[output_dir / 'jaccard_heatmap.png', output_dir / 'section_specific_tokens.png'])
+    pipe.add('analysis', write_analysis, inputs=['results'], params={'output_dir': output_dir},
+             outputs=[output_dir / 'analysis.md'])
+    return pipe
+
+
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    pages = parse_transcription(TRANSCRIPTION)
-    sections = get_sections(pages)
-    
     print("Analyzing token co-occurrence patterns...")
-    analysis = section_token_analysis(sections)
+    values, _ = build_pipeline().run()
+    analysis = values['results']
     
     print(f"  Vocab sizes: {analysis['section_vocab_sizes']}")
     print(f"  Universal tokens: {analysis['universal_tokens']['count']}")
     for s, v in analysis['section_specific_tokens'].items():
         print(f"  {s}-specific: {v['count']} tokens")
     
-    # Save results
-    with open(OUTPUT_DIR / 'results.json', 'w') as f:
-        json.dump(analysis, f, indent=2)
-    
-    plot_jaccard_matrix(sections, OUTPUT_DIR)
-    plot_section_specific(analysis, OUTPUT_DIR)
-    write_analysis(analysis, OUTPUT_DIR)
-    
     print(f"\nResults written to {OUTPUT_DIR}")
 
 
@@ -13,67 +13,47 @@ Spoiler: the answer will be statistically significant and existentially irreleva
 import json
 import os
 import sys
-from collections import Counter
+from functools import partial
 from pathlib import Path
 
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import stats
-from scipy.spatial.distance import jensenshannon
+from scipy import sparse, stats
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import jensenshannon, squareform
 
 sys.path.insert(0, str(Path(__file__).parent))
-from parse_eva import parse_transcription, tokenize, folio_number
+from corpus import Corpus, corpus_key
+from divergence import hellinger_matrix, jensen_shannon_matrix
+from entropy import corpus_char_positions
+from permutation import sequential_permutation_test
+from pipeline import Pipeline
+from folio_index import FolioIndex
+from folio_features import load_folio_features, select_features
+from lofo import MODELS, lofo_permutation_test
 
 TRANSCRIPTION = Path(__file__).parents[2] / 'data/raw/transcriptions/eva/v101-claston.txt'
 OUTPUT_DIR = Path(__file__).parents[2] / 'experiments/03-currier-ab'
 
+# Fixed so the null model and LOFO draws are reproducible and cached;
+# seed=None asks for a fresh draw, which is never cached
+SEED = 0
 
-def get_ab_texts(pages):
-    """Split into Currier A (f1-57) and B (f88-116) candidate pages."""
-    a_pages, b_pages = {}, {}
-    for folio, lines in pages.items():
-        num = folio_number(folio)
-        if 1 <= num <= 57:
-            a_pages[folio] = lines
-        elif 88 <= num <= 116:
-            b_pages[folio] = lines
-    
-    a_text = '\n'.join(line for lines in a_pages.values() for line in lines)
-    b_text = '\n'.join(line for lines in b_pages.values() for line in lines)
-    
-    return a_text, b_text, a_pages, b_pages
 
-
-def char_freq_vector(text, alphabet=None):
-    """Get character frequency as a probability vector over a shared alphabet."""
-    counts = Counter(c for c in text if c.isalpha() or c.isdigit())
-    if alphabet is None:
-        alphabet = sorted(counts.keys())
-    total = sum(counts.values())
+def freq_vector(counts):
+    """Normalize a count vector into a probability vector."""
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
     if total == 0:
-        return np.zeros(len(alphabet)), alphabet
-    vec = np.array([counts.get(c, 0) / total for c in alphabet])
-    return vec, alphabet
+        return np.zeros(len(counts))
+    return counts / total
 
 
-def token_freq_vector(tokens, vocabulary=None):
-    """Get token frequency as probability vector."""
-    counts = Counter(tokens)
-    if vocabulary is None:
-        vocabulary = sorted(counts.keys())
-    total = sum(counts.values())
-    if total == 0:
-        return np.zeros(len(vocabulary)), vocabulary
-    vec = np.array([counts.get(t, 0) / total for t in vocabulary])
-    return vec, vocabulary
-
-
-def word_length_distribution(tokens):
+def word_length_distribution(lengths):
     """Get word length stats."""
-    lengths = [len(t) for t in tokens if t]
-    if not lengths:
+    if not len(lengths):
         return {'mean': 0, 'std': 0, 'median': 0}
     return {
         'mean': round(float(np.mean(lengths)), 4),
@@ -82,63 +62,92 @@ def word_length_distribution(tokens):
     }
 
 
-def null_model_divergence(full_text, n_trials=1000):
-    """Randomly split text into two halves, measure JSD each time."""
-    import re
-    lines = [l for l in full_text.split('\n') if l.strip()]
-    divergences = []
-    
-    for _ in range(n_trials):
-        np.random.shuffle(lines)
-        mid = len(lines) // 2
-        half1 = '\n'.join(lines[:mid])
-        half2 = '\n'.join(lines[mid:])
-        
-        chars1 = [c for c in half1 if c.isalpha() or c.isdigit()]
-        chars2 = [c for c in half2 if c.isalpha() or c.isdigit()]
-        
-        all_chars = sorted(set(chars1 + chars2))
-        v1, _ = char_freq_vector(half1, all_chars)
-        v2, _ = char_freq_vector(half2, all_chars)
-        
-        # Add small epsilon to avoid zero divisions
-        v1 = v1 + 1e-10
-        v2 = v2 + 1e-10
-        v1 /= v1.sum()
-        v2 /= v2.sum()
-        
-        divergences.append(float(jensenshannon(v1, v2)))
+def line_char_matrix(corpus, line_ranges, char_mask):
+    """Per-line character counts, shape (lines, alphabet), masked columns only."""
+    chars = corpus.chars_in(line_ranges)
+    lengths = np.concatenate([np.diff(corpus.line_char_offsets[lo:hi + 1]) for lo, hi in line_ranges])
+    line_idx = np.repeat(np.arange(len(lengths)), lengths)
+    alphabet_size = len(corpus.alphabet)
+    counts = np.bincount(line_idx * alphabet_size + chars, minlength=len(lengths) * alphabet_size)
+    return counts.reshape(len(lengths), alphabet_size)[:, char_mask].astype(float)
+
+
+def smooth_distribution(counts, eps=1e-10):
+    """Normalize rows to probabilities, add eps and renormalize."""
+    counts = np.asarray(counts, dtype=float)
+    totals = counts.sum(axis=-1, keepdims=True)
+    p = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0) + eps
+    return p / p.sum(axis=-1, keepdims=True)
+
+
+def batched_jensenshannon(p, q):
+    """Row-wise equivalent of scipy.spatial.distance.jensenshannon (base e)."""
+    m = (p + q) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kl_p = np.where(p > 0, p * np.log(p / m), 0.0).sum(axis=-1)
+        kl_q = np.where(q > 0, q * np.log(q / m), 0.0).sum(axis=-1)
+    return np.sqrt(np.maximum((kl_p + kl_q) / 2, 0.0))
+
+
+def null_model_divergence(line_counts, n_trials=1000, seed=None, batch_size=1024):
+    """Randomly split lines into two halves, measure character JSD each time.
+
+    Each batch of trials is a (batch, lines) 0/1 mask with exactly half the
+    lines set, so the first half's counts are one matrix product and the
+    second half's are the remainder. Counts stay exact in float32.
+    """
+    rng = np.random.default_rng(seed)
+    line_counts = np.asarray(line_counts, dtype=np.float32)
+    n_lines = len(line_counts)
+    mid = n_lines // 2
+    total = line_counts.sum(axis=0, dtype=np.float64)
+    
+    divergences = np.empty(n_trials)
+    for start in range(0, n_trials, batch_size):
+        size = min(batch_size, n_trials - start)
+        # The mid smallest random keys in each row pick that trial's first half
+        keys = rng.random((size, n_lines))
+        kth = np.partition(keys, mid - 1, axis=1)[:, mid - 1:mid]
+        masks = (keys <= kth).astype(np.float32)
+        half1 = (masks @ line_counts).astype(np.float64)
+        half2 = total - half1
+        divergences[start:start + size] = batched_jensenshannon(
+            smooth_distribution(half1), smooth_distribution(half2))
     
     return divergences
 
 
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+def compute_ab_statistics():
+    """Everything about the A/B split that does not involve the null model."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    a_folios = index.folios_in('currier', 'A')
+    b_folios = index.folios_in('currier', 'B')
+    a_lines = index.line_ranges('currier', 'A')
+    b_lines = index.line_ranges('currier', 'B')
     
-    pages = parse_transcription(TRANSCRIPTION)
-    a_text, b_text, a_pages, b_pages = get_ab_texts(pages)
+    a_tokens = corpus.tokens_in(a_lines)
+    b_tokens = corpus.tokens_in(b_lines)
     
-    print(f"Currier A pages: {len(a_pages)}, B pages: {len(b_pages)}")
+    # Character counts over letters and digits only
+    alnum = corpus.char_mask(lambda c: c.isalpha() or c.isdigit())
+    a_char_counts = corpus.char_counts(corpus.chars_in(a_lines)) * alnum
+    b_char_counts = corpus.char_counts(corpus.chars_in(b_lines)) * alnum
     
-    a_tokens = tokenize(a_text)
-    b_tokens = tokenize(b_text)
-    
-    # Shared alphabet/vocabulary
-    all_chars = sorted(set(c for c in (a_text + b_text) if c.isalpha() or c.isdigit()))
-    all_vocab = sorted(set(a_tokens + b_tokens))
+    # Shared alphabet/vocabulary: everything seen in either half
+    char_present = (a_char_counts + b_char_counts) > 0
+    all_chars = [str(c) for c in np.asarray(corpus.alphabet)[char_present]]
+    a_tok_counts = corpus.token_counts(a_tokens)
+    b_tok_counts = corpus.token_counts(b_tokens)
+    vocab_present = (a_tok_counts + b_tok_counts) > 0
     
     # Character frequencies
-    a_char_vec, _ = char_freq_vector(a_text, all_chars)
-    b_char_vec, _ = char_freq_vector(b_text, all_chars)
+    a_char_vec = freq_vector(a_char_counts[char_present])
+    b_char_vec = freq_vector(b_char_counts[char_present])
     
     # Chi-square on character frequencies
-    a_char_counts = Counter(c for c in a_text if c.isalpha() or c.isdigit())
-    b_char_counts = Counter(c for c in b_text if c.isalpha() or c.isdigit())
-    
-    chi_chars = list(set(list(a_char_counts.keys()) + list(b_char_counts.keys())))
-    chi_chars.sort()
-    a_obs = np.array([a_char_counts.get(c, 0) for c in chi_chars])
-    b_obs = np.array([b_char_counts.get(c, 0) for c in chi_chars])
+    a_obs = a_char_counts[char_present]
+    b_obs = b_char_counts[char_present]
     
     b_expected = b_obs * (a_obs.sum() / b_obs.sum())
     # Filter out characters where expected count is 0
@@ -150,16 +159,14 @@ def main():
     chi2, chi_p = stats.chisquare(a_filt, f_exp=b_filt)
     
     # Token frequencies
-    a_tok_vec, _ = token_freq_vector(a_tokens, all_vocab)
-    b_tok_vec, _ = token_freq_vector(b_tokens, all_vocab)
+    a_tok_vec = freq_vector(a_tok_counts[vocab_present])
+    b_tok_vec = freq_vector(b_tok_counts[vocab_present])
     
     # Word lengths
-    a_wl = word_length_distribution(a_tokens)
-    b_wl = word_length_distribution(b_tokens)
+    a_lengths = np.asarray(corpus.token_lengths[a_tokens])
+    b_lengths = np.asarray(corpus.token_lengths[b_tokens])
     
     # T-test on word lengths
-    a_lengths = [len(t) for t in a_tokens]
-    b_lengths = [len(t) for t in b_tokens]
     t_stat, t_p = stats.ttest_ind(a_lengths, b_lengths)
     
     # Jensen-Shannon divergence (character level)
@@ -169,70 +176,246 @@ def main():
     b_smooth /= b_smooth.sum()
     jsd_chars = float(jensenshannon(a_smooth, b_smooth))
     
-    # Token-level JSD
-    a_tok_smooth = a_tok_vec + 1e-10
-    b_tok_smooth = b_tok_vec + 1e-10
-    a_tok_smooth /= a_tok_smooth.sum()
-    b_tok_smooth /= b_tok_smooth.sum()
-    jsd_tokens = float(jensenshannon(a_tok_smooth, b_tok_smooth))
-    
-    # Null model
-    print("Running null model (1000 random splits)...")
-    full_text = a_text + '\n' + b_text
-    null_divergences = null_model_divergence(full_text, n_trials=1000)
+    # Token-level JSD over the union support only (scipy's distance, base e)
+    jsd_tokens = float(jensen_shannon_matrix(
+        np.stack([a_tok_counts, b_tok_counts]), base=np.e, distance=True)[0, 1])
+    
+    return {
+        'a_pages': len(a_folios),
+        'b_pages': len(b_folios),
+        'a_tokens': len(a_tokens),
+        'b_tokens': len(b_tokens),
+        'a_unique': int(np.count_nonzero(a_tok_counts)),
+        'b_unique': int(np.count_nonzero(b_tok_counts)),
+        'a_char_vec': a_char_vec,
+        'b_char_vec': b_char_vec,
+        'all_chars': all_chars,
+        'a_lengths': a_lengths,
+        'b_lengths': b_lengths,
+        'chi2': float(chi2),
+        'chi_p': float(chi_p),
+        't_stat': float(t_stat),
+        't_p': float(t_p),
+        'jsd_chars': jsd_chars,
+        'jsd_tokens': jsd_tokens,
+        'line_counts': line_char_matrix(corpus, a_lines + b_lines, alnum),
+    }
+
+
+def folio_feature_counts(corpus, char_mask):
+    """Sparse folio x character and folio x token count matrices."""
+    chars, _, char_folios = corpus_char_positions(corpus, char_mask)
+    token_folios = np.repeat(np.arange(len(corpus.folios)), np.diff(
+        corpus.line_token_offsets[np.asarray(corpus.folio_line_offsets)]))
+    shape = len(corpus.folios)
+    char_counts = sparse.csr_matrix((np.ones(len(chars)), (char_folios, chars)),
+                                    shape=(shape, len(corpus.alphabet)))
+    token_counts = sparse.csr_matrix((np.ones(len(corpus.tokens)), (token_folios, corpus.tokens)),
+                                     shape=(shape, len(corpus.vocab)))
+    return char_counts, token_counts
+
+
+def compute_divergence_maps():
+    """Folio x folio JSD across the A/B split and section-level distances."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    alnum = corpus.char_mask(lambda c: c.isalpha() or c.isdigit())
+    char_counts, token_counts = folio_feature_counts(corpus, alnum)
+
+    a_folios = index.folios_in('currier', 'A')
+    b_folios = index.folios_in('currier', 'B')
+    order = np.concatenate([a_folios, b_folios])
+    folio_jsd = jensen_shannon_matrix(char_counts[order])
+
+    sections = index.groups('section')
+    membership = sparse.csr_matrix(
+        (np.ones(len(corpus.folios)), (np.array([sections.index(s) for s in index.labels['section']]),
+                                       np.arange(len(corpus.folios)))),
+        shape=(len(sections), len(corpus.folios)))
+    section_tokens = membership @ token_counts
+    return {
+        'folios': [corpus.folios[i] for i in order.tolist()],
+        'num_a': len(a_folios),
+        'folio_jsd': folio_jsd,
+        'sections': sections,
+        'section_jsd': jensen_shannon_matrix(section_tokens, distance=True),
+        'section_hellinger': hellinger_matrix(section_tokens),
+    }
+
+
+def summarize_divergence(maps):
+    """Mean folio JSD within A, within B and across the split."""
+    jsd, num_a = maps['folio_jsd'], maps['num_a']
+    n = len(jsd)
+    is_a = np.arange(n) < num_a
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+
+    def mean(mask):
+        return round(float(jsd[mask & upper].mean()), 6) if (mask & upper).any() else 0.0
+
+    within_a = mean(is_a[:, None] & is_a[None, :])
+    within_b = mean(~is_a[:, None] & ~is_a[None, :])
+    between = mean(is_a[:, None] & ~is_a[None, :])
+    sections = maps['sections']
+    return {
+        'folio_character_jsd': {
+            'within_a': within_a,
+            'within_b': within_b,
+            'between_a_b': between,
+            'separation_ratio': round(between / ((within_a + within_b) / 2), 4) if within_a + within_b else 0.0,
+        },
+        'section_token_distance': {
+            f"{sections[i]}-{sections[j]}": {
+                'jsd_distance': round(float(maps['section_jsd'][i, j]), 4),
+                'hellinger': round(float(maps['section_hellinger'][i, j]), 4),
+            }
+            for i in range(len(sections)) for j in range(i + 1, len(sections))
+        },
+    }
+
+
+def plot_divergence_maps(maps, output_dir=OUTPUT_DIR):
+    plot_folio_distance_map(maps, output_dir)
+    plot_section_dendrogram(maps, output_dir)
+
+
+def run_lofo_classification(max_bigrams=100, max_trials=10_000, seed=None):
+    """Leave-one-folio-out A/B classification with a label-permutation control."""
+    corpus = Corpus.load(TRANSCRIPTION)
+    index = FolioIndex.build(corpus)
+    currier = np.array(index.labels['currier'])
+    rows = np.flatnonzero(np.isin(currier, ['A', 'B']))
+    labels = (currier[rows] == 'B').astype(int)
+    counts, blocks, _ = select_features(load_folio_features(TRANSCRIPTION), rows, max_bigrams)
+
+    results = {}
+    for model in MODELS:
+        observed, null = lofo_permutation_test(model, counts, labels, blocks,
+                                               max_trials=max_trials, seed=seed)
+        wrong = np.flatnonzero(observed.predicted != labels)
+        results[model] = {
+            'accuracy': round(observed.accuracy, 4),
+            'balanced_accuracy': round(observed.balanced_accuracy, 4),
+            'confusion': {'A': observed.confusion[0].tolist(), 'B': observed.confusion[1].tolist()},
+            'misclassified': [corpus.folios[rows[i]] for i in wrong.tolist()],
+            'permutation': {
+                'n_trials': null.n_trials,
+                'p_value': null.p_value,
+                'null_mean_balanced_accuracy': round(float(np.mean(null.null)), 4),
+                'decision': null.decision,
+            },
+        }
+    return {'folds': len(rows), 'features': counts.shape[1], 'models': results}
+
+
+def run_null_model(ab, max_trials=1_000_000, seed=None, workers=None):
+    """Sequential permutation test of the character JSD against random splits."""
+    print(f"Running null model (sequential, up to {max_trials} random splits)...")
+    return sequential_permutation_test(
+        partial(null_model_divergence, ab['line_counts']), ab['jsd_chars'],
+        max_trials=max_trials, workers=workers, seed=seed)
+
+
+def summarize_results(ab, null, divergence, lofo, output_dir=OUTPUT_DIR):
+    """Assemble and save results.json."""
+    jsd_chars = ab['jsd_chars']
+    null_divergences = null.null
     null_mean = float(np.mean(null_divergences))
     null_std = float(np.std(null_divergences))
-    percentile = float(np.mean([1 for d in null_divergences if d < jsd_chars]) * 100)
+    percentile = float(np.mean(null_divergences < jsd_chars) * 100)
     
     results = {
         'currier_a': {
-            'num_pages': len(a_pages),
-            'total_tokens': len(a_tokens),
-            'unique_tokens': len(set(a_tokens)),
-            'word_length': a_wl,
+            'num_pages': ab['a_pages'],
+            'total_tokens': ab['a_tokens'],
+            'unique_tokens': ab['a_unique'],
+            'word_length': word_length_distribution(ab['a_lengths']),
         },
         'currier_b': {
-            'num_pages': len(b_pages),
-            'total_tokens': len(b_tokens),
-            'unique_tokens': len(set(b_tokens)),
-            'word_length': b_wl,
+            'num_pages': ab['b_pages'],
+            'total_tokens': ab['b_tokens'],
+            'unique_tokens': ab['b_unique'],
+            'word_length': word_length_distribution(ab['b_lengths']),
         },
         'chi_square': {
-            'statistic': round(float(chi2), 4),
-            'p_value': float(chi_p),
+            'statistic': round(ab['chi2'], 4),
+            'p_value': ab['chi_p'],
         },
         'word_length_ttest': {
-            't_statistic': round(float(t_stat), 4),
-            'p_value': float(t_p),
+            't_statistic': round(ab['t_stat'], 4),
+            'p_value': ab['t_p'],
         },
         'jensen_shannon_divergence': {
             'character_level': round(jsd_chars, 6),
-            'token_level': round(jsd_tokens, 6),
+            'token_level': round(ab['jsd_tokens'], 6),
         },
         'null_model': {
             'mean_jsd': round(null_mean, 6),
             'std_jsd': round(null_std, 6),
             'actual_jsd': round(jsd_chars, 6),
+            'n_trials': null.n_trials,
+            'p_value': null.p_value,
+            'p_value_ci': [null.ci_low, null.ci_high],
+            'decision': null.decision,
+            'seed_entropy': str(null.entropy),
             'percentile': round(percentile, 1),
             'z_score': round((jsd_chars - null_mean) / null_std, 2) if null_std > 0 else 0,
-        }
+        },
+        'divergence_maps': divergence,
+        'lofo_classification': lofo,
     }
     
-    print(f"  Chi-square: χ²={chi2:.2f}, p={chi_p:.2e}")
-    print(f"  Word length t-test: t={t_stat:.2f}, p={t_p:.2e}")
-    print(f"  JSD (chars): {jsd_chars:.6f}")
-    print(f"  Null model mean JSD: {null_mean:.6f} ± {null_std:.6f}")
-    print(f"  A/B JSD percentile: {percentile:.1f}%")
-    
-    with open(OUTPUT_DIR / 'results.json', 'w') as f:
+    with open(output_dir / 'results.json', 'w') as f:
         json.dump(results, f, indent=2)
+    return results
+
+
+def plot_results(ab, null, output_dir=OUTPUT_DIR):
+    plot_char_comparison(ab['a_char_vec'], ab['b_char_vec'], ab['all_chars'], output_dir)
+    plot_word_lengths(ab['a_lengths'], ab['b_lengths'], output_dir)
+    plot_null_model(null.null, ab['jsd_chars'], output_dir)
+
+
+def build_pipeline(max_trials=1_000_000, workers=None, seed=SEED, output_dir=OUTPUT_DIR):
+    """Experiment 3 as memoized stages; see pipeline.py."""
+    pipe = Pipeline('exp03_currier_ab', source=corpus_key(TRANSCRIPTION))
+    pipe.add('ab_statistics', compute_ab_statistics)
+    pipe.add('null_model', run_null_model, inputs=['ab_statistics'],
+             params={'max_trials': max_trials, 'seed': seed}, runtime={'workers': workers})
+    pipe.add('divergence_maps', compute_divergence_maps)
+    pipe.add('divergence_summary', summarize_divergence, inputs=['divergence_maps'])
+    pipe.add('divergence_plots', plot_divergence_maps, inputs=['divergence_maps'],
+             params={'output_dir': output_dir},
+             outputs=[output_dir / 'folio_distance_map.png', output_dir / 'section_dendrogram.png'])
+    pipe.add('lofo', run_lofo_classification, params={'max_bigrams': 100, 'seed': seed})
+    pipe.add('results', summarize_results,
+             inputs=['ab_statistics', 'null_model', 'divergence_summary', 'lofo'],
+             params={'output_dir': output_dir},
+             outputs=[output_dir / 'results.json'])
+    pipe.add('plots', plot_results, inputs=['ab_statistics', 'null_model'],
+             params={'output_dir': output_dir},
+             outputs=[output_dir / name for name in ('char_comparison.png', 'word_lengths.png', 'null_model.png')])
+    pipe.add('analysis', write_analysis, inputs=['results'],
+             params={'output_dir': output_dir}, outputs=[output_dir / 'analysis.md'])
+    return pipe
+
+
+def main(max_trials=1_000_000, workers=None, seed=SEED):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Plots
-    plot_char_comparison(a_char_vec, b_char_vec, all_chars, OUTPUT_DIR)
-    plot_word_lengths(a_lengths, b_lengths, OUTPUT_DIR)
-    plot_null_model(null_divergences, jsd_chars, OUTPUT_DIR)
-    
-    write_analysis(results, OUTPUT_DIR)
+    values, _ = build_pipeline(max_trials, workers, seed).run()
+    results = values['results']
+    a, b = results['currier_a'], results['currier_b']
+    null = results['null_model']
+    
+    print(f"Currier A pages: {a['num_pages']}, B pages: {b['num_pages']}")
+    print(f"  Chi-square: χ²={results['chi_square']['statistic']:.2f}, p={results['chi_square']['p_value']:.2e}")
+    print(f"  Word length t-test: t={results['word_length_ttest']['t_statistic']:.2f}, "
+          f"p={results['word_length_ttest']['p_value']:.2e}")
+    print(f"  JSD (chars): {null['actual_jsd']:.6f}")
+    print(f"  Null model mean JSD: {null['mean_jsd']:.6f} ± {null['std_jsd']:.6f}")
+    print(f"  A/B JSD percentile: {null['percentile']:.1f}%")
+    print(f"  Null model: {null['n_trials']} trials, p={null['p_value']:.2e} ({null['decision']})")
     print(f"\nResults written to {OUTPUT_DIR}")
 
 
@@ -310,6 +493,40 @@ def plot_null_model(null_divergences, actual_jsd, output_dir):
     plt.close()
 
 
+def plot_folio_distance_map(maps, output_dir):
+    """Folio x folio character JSD, Currier A folios first."""
+    jsd, num_a = maps['folio_jsd'], maps['num_a']
+    fig, ax = plt.subplots(figsize=(9, 8))
+    im = ax.imshow(jsd, cmap='viridis')
+    ax.axhline(num_a - 0.5, color='white', linewidth=1)
+    ax.axvline(num_a - 0.5, color='white', linewidth=1)
+    ax.set_xticks([(num_a - 1) / 2, num_a + (len(jsd) - num_a - 1) / 2])
+    ax.set_xticklabels(['Currier A', 'Currier B'])
+    ax.set_yticks([(num_a - 1) / 2, num_a + (len(jsd) - num_a - 1) / 2])
+    ax.set_yticklabels(['Currier A', 'Currier B'])
+    plt.colorbar(im, label='Jensen-Shannon Divergence (bits)')
+    ax.set_title('Folio-by-Folio Character Divergence\n'
+                 '(Two dark squares would be nice. Two dark squares would be something.)',
+                 fontsize=11, style='italic')
+    plt.tight_layout()
+    plt.savefig(output_dir / 'folio_distance_map.png', dpi=150, bbox_inches='tight')
+    plt.close()
+
+
+def plot_section_dendrogram(maps, output_dir):
+    """Average-linkage clustering of sections by token JSD distance."""
+    fig, ax = plt.subplots(figsize=(9, 6))
+    if len(maps['sections']) > 1:
+        linkage = hierarchy.linkage(squareform(maps['section_jsd'], checks=False), method='average')
+        hierarchy.dendrogram(linkage, labels=maps['sections'], ax=ax, color_threshold=0)
+    ax.set_ylabel('Jensen-Shannon Distance (token level)')
+    ax.set_title('Section Family Tree\n'
+                 '(Every family has its outcasts. This one is astronomical.)', fontsize=11, style='italic')
+    plt.tight_layout()
+    plt.savefig(output_dir / 'section_dendrogram.png', dpi=150, bbox_inches='tight')
+    plt.close()
+
+
 def write_analysis(results, output_dir):
     ab = results
     null = ab['null_model']
@@ -349,12 +566,44 @@ def write_analysis(results, output_dir):
 - Token-level JSD: **{ab['jensen_shannon_divergence']['token_level']}**
 
 ### Null Model Comparison
-- Null model (1000 random splits) mean JSD: **{null['mean_jsd']} ± {null['std_jsd']}**
+- Null model ({null['n_trials']} random splits) mean JSD: **{null['mean_jsd']} ± {null['std_jsd']}**
+- Permutation p-value: **{null['p_value']:.2e}** (99.9% CI {null['p_value_ci'][0]:.2e}–{null['p_value_ci'][1]:.2e}, {null['decision'].replace('_', ' ')})
 - Actual A/B JSD: **{null['actual_jsd']}**
 - Percentile rank: **{null['percentile']}%** (higher = more distinct than random)
 - Z-score: **{null['z_score']}**
 - A/B divergence exceeds null model? **{null_sig}**
+"""
 
+    divergence = ab.get('divergence_maps')
+    if divergence:
+        folio = divergence['folio_character_jsd']
+        md += f"""
+### Folio-Level Divergence
+
+Mean character JSD (bits) between pairs of folios:
+
+| Within A | Within B | Between A and B | Between / within |
+|----------|----------|-----------------|------------------|
+| {folio['within_a']} | {folio['within_b']} | {folio['between_a_b']} | {folio['separation_ratio']} |
+"""
+
+    lofo = ab.get('lofo_classification')
+    if lofo:
+        md += f"""
+### Leave-One-Folio-Out Classification
+
+Each of the {lofo['folds']} A/B folios is classified by a model fitted on all the others, from {lofo['features']} count features (characters, common bigrams, word-length and line-length histograms).
+
+| Model | Accuracy | Balanced accuracy | Permutation null mean | Permutation p-value |
+|-------|----------|-------------------|-----------------------|---------------------|
+"""
+        names = {'naive_bayes': 'Multinomial naive Bayes', 'lda': 'Linear discriminant'}
+        for model, r in lofo['models'].items():
+            perm = r['permutation']
+            md += (f"| {names.get(model, model)} | {r['accuracy']} | {r['balanced_accuracy']} | "
+                   f"{perm['null_mean_balanced_accuracy']} | {perm['p_value']:.2e} ({perm['n_trials']} trials) |\n")
+
+    md += """
 ## Interpretation
 
 *Here comes the part where I pretend these numbers matter to anyone.*
@@ -382,6 +631,8 @@ This doesn't prove A/B is meaningless — it may operate at a higher structural
 ![Character Comparison](char_comparison.png)
 ![Word Lengths](word_lengths.png)
 ![Null Model](null_model.png)
+![Folio Distance Map](folio_distance_map.png)
+![Section Dendrogram](section_dendrogram.png)
 """
     
     with open(output_dir / 'analysis.md', 'w') as f:
@@ -389,4 +640,15 @@ This doesn't prove A/B is meaningless — it may operate at a higher structural
 
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Currier A/B statistical separation')
+    parser.add_argument('--max-trials', type=int, default=1_000_000,
+                        help='Upper bound on null model splits (stops early once resolved)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=SEED, help='Random seed for the null model and LOFO')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Draw a fresh, unseeded null model (never cached)')
+    args = parser.parse_args()
+    
+    main(max_trials=args.max_trials, workers=args.workers, seed=None if args.fresh else args.seed)
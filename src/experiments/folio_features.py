@@ -0,0 +1,146 @@
+"""
+Per-folio count features: characters, within-word character bigrams,
+word-length and line-length histograms.
+
+One row per folio in corpus order, one block of columns per feature
+family, all raw counts so count-based models can add and subtract them.
+The matrix is cached next to the corpus arrays, keyed by the corpus hash
+and the feature settings, since recounting 175 folios every run would be
+almost as pointless as reading them.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from corpus import TRANSCRIPTION, Corpus, corpus_key
+
+FEATURE_DIR = Path(__file__).parents[2] / 'data/derived/cache/features'
+
+# Bump when the feature layout changes.
+FEATURE_VERSION = 1
+
+# Histogram bins; the last bin collects everything longer
+MAX_WORD_LENGTH = 15
+MAX_LINE_LENGTH = 20
+
+BLOCKS = ('chars', 'bigrams', 'word_length', 'line_length')
+
+
+class FolioFeatures(NamedTuple):
+    folios: list
+    counts: np.ndarray     # (folios, features) float64 counts
+    blocks: np.ndarray     # block index into BLOCKS per feature column
+    names: list            # feature name per column
+
+    def block(self, name):
+        """Column mask of one feature block."""
+        return self.blocks == BLOCKS.index(name)
+
+
+def select_features(features, rows=None, max_bigrams=100):
+    """
+    Counts and block ids for chosen rows, keeping only the commonest bigrams.
+
+    Returns:
+        (counts, blocks, names) with columns in their original order
+    """
+    rows = np.arange(len(features.folios)) if rows is None else np.asarray(rows)
+    counts = features.counts[rows]
+    bigrams = np.flatnonzero(features.block('bigrams'))
+    top = bigrams[np.argsort(-counts[:, bigrams].sum(axis=0), kind='stable')[:max_bigrams]]
+    cols = np.sort(np.concatenate([np.flatnonzero(~features.block('bigrams')), top]))
+    return counts[:, cols], features.blocks[cols], [features.names[c] for c in cols]
+
+
+def feature_settings():
+    return {
+        'version': FEATURE_VERSION,
+        'max_word_length': MAX_WORD_LENGTH,
+        'max_line_length': MAX_LINE_LENGTH,
+    }
+
+
+def _histogram(values, groups, num_groups, max_value):
+    """(groups, max_value) counts of values 1..max_value, clipped at the top."""
+    bins = np.clip(values, 1, max_value) - 1
+    return np.bincount(groups * max_value + bins, minlength=num_groups * max_value) \
+        .reshape(num_groups, max_value)
+
+
+def build_folio_features(corpus):
+    """Count every feature block for every folio of a Corpus."""
+    num_folios = len(corpus.folios)
+    alphabet = [str(c) for c in np.asarray(corpus.alphabet)]
+    k = len(alphabet)
+    folio_of_line = np.repeat(np.arange(num_folios), np.diff(corpus.folio_line_offsets))
+
+    # Characters: letters and digits only, as in exp03
+    chars = np.asarray(corpus.chars).astype(np.int64)
+    line_of_char = np.repeat(np.arange(corpus.num_lines), np.diff(corpus.line_char_offsets))
+    folio_of_char = folio_of_line[line_of_char]
+    letters = corpus.char_mask(lambda c: c.isalpha() or c.isdigit())
+    keep = letters[chars]
+    char_counts = np.bincount(folio_of_char[keep] * k + chars[keep],
+                              minlength=num_folios * k).reshape(num_folios, k)
+
+    # Bigrams of adjacent letters on the same line, so never across a word break
+    pair = keep[:-1] & keep[1:] & (line_of_char[:-1] == line_of_char[1:])
+    codes = chars[:-1][pair] * k + chars[1:][pair]
+    bigram_counts = np.bincount(folio_of_char[:-1][pair] * k * k + codes,
+                                minlength=num_folios * k * k).reshape(num_folios, k * k)
+
+    token_lengths = np.asarray(corpus.token_lengths)[np.asarray(corpus.tokens)]
+    folio_of_token = folio_of_line[np.repeat(np.arange(corpus.num_lines), np.diff(corpus.line_token_offsets))]
+    word_lengths = _histogram(token_lengths, folio_of_token, num_folios, MAX_WORD_LENGTH)
+
+    tokens_per_line = np.diff(corpus.line_token_offsets)
+    nonempty = tokens_per_line > 0
+    line_lengths = _histogram(tokens_per_line[nonempty], folio_of_line[nonempty], num_folios, MAX_LINE_LENGTH)
+
+    char_cols = np.flatnonzero(char_counts.sum(axis=0))
+    bigram_cols = np.flatnonzero(bigram_counts.sum(axis=0))
+    blocks = [
+        (char_counts[:, char_cols], [alphabet[c] for c in char_cols]),
+        (bigram_counts[:, bigram_cols], [alphabet[c // k] + alphabet[c % k] for c in bigram_cols]),
+        (word_lengths, [f"len{n}" for n in range(1, MAX_WORD_LENGTH + 1)]),
+        (line_lengths, [f"line{n}" for n in range(1, MAX_LINE_LENGTH + 1)]),
+    ]
+    return FolioFeatures(
+        folios=list(corpus.folios),
+        counts=np.hstack([b for b, _ in blocks]).astype(np.float64),
+        blocks=np.concatenate([np.full(b.shape[1], i, dtype=np.int8) for i, (b, _) in enumerate(blocks)]),
+        names=[name for _, names in blocks for name in names],
+    )
+
+
+def features_key(filepath=TRANSCRIPTION):
+    sha256 = hashlib.sha256(corpus_key(filepath).encode('utf-8'))
+    sha256.update(json.dumps(feature_settings(), sort_keys=True).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def load_folio_features(filepath=TRANSCRIPTION, feature_dir=FEATURE_DIR):
+    """Folio features from the cache, counting them on a miss."""
+    feature_dir = Path(feature_dir)
+    path = feature_dir / f"{features_key(filepath)}.npz"
+    if not path.exists():
+        features = build_folio_features(Corpus.load(filepath))
+        feature_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=feature_dir, prefix=path.name + '.', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, folios=np.array(features.folios), counts=features.counts,
+                     blocks=features.blocks, names=np.array(features.names))
+        os.replace(tmp, path)
+    with np.load(path, allow_pickle=False) as data:
+        return FolioFeatures(
+            folios=[str(f) for f in data['folios']],
+            counts=data['counts'],
+            blocks=data['blocks'],
+            names=[str(n) for n in data['names']],
+        )
@@ -0,0 +1,108 @@
+"""
+Folio index: manuscript order, section and Currier labels, and the line
+ranges each label group occupies in the corpus arrays.
+
+Built once per corpus so nobody has to reclassify 175 folios every time
+they want the botanical pages. Small mercies.
+"""
+
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from corpus import merge_ranges
+from parse_eva import CURRIER_MAP, folio_number, get_section
+
+FOLIO_METADATA = Path(__file__).parents[2] / 'data/raw/transcriptions/metadata/folios.csv'
+
+
+def canonical_folio(folio_id):
+    """Transcription folio id to canonical metadata name: '1r' -> 'f001r'."""
+    return f"f{folio_number(folio_id):03d}{folio_id[-1]}"
+
+
+def get_currier(folio_id):
+    """Default Currier language of a folio ('' if unclassified)."""
+    num = folio_number(folio_id)
+    for language, (lo, hi) in CURRIER_MAP.items():
+        if lo <= num <= hi:
+            return language
+    return ''
+
+
+def load_folio_labels(metadata_path=FOLIO_METADATA):
+    """Read {canonical folio: {column: value}} from folios.csv, if present."""
+    metadata_path = Path(metadata_path)
+    if not metadata_path.exists():
+        return {}
+    with open(metadata_path, newline='', encoding='utf-8') as f:
+        rows = csv.DictReader(line for line in f if not line.lstrip().startswith('#'))
+        return {row['folio'].strip(): row for row in rows if row.get('folio')}
+
+
+class FolioIndex:
+    """
+    Precomputed folio -> label lookups and label -> line range groups.
+
+    Labels come from SECTION_MAP and CURRIER_MAP, overridden per folio by
+    any non-empty section/currier values in folios.csv. Folios are in the
+    corpus (manuscript) order, so a label made of consecutive folios is a
+    single line range and slices the corpus arrays without copying.
+    """
+
+    FIELDS = ('section', 'currier')
+
+    def __init__(self, corpus, labels):
+        self.corpus = corpus
+        self.folios = corpus.folios
+        self.numbers = np.array([folio_number(f) for f in self.folios], dtype=np.int32)
+        self.labels = {field: list(values) for field, values in labels.items()}
+        self._position = {f: i for i, f in enumerate(self.folios)}
+
+        self._groups = {}
+        for field, values in self.labels.items():
+            values = np.array(values)
+            for label in dict.fromkeys(values.tolist()):
+                if not label:
+                    continue
+                folio_indices = np.flatnonzero(values == label)
+                self._groups[field, label] = (folio_indices, corpus.line_ranges(folio_indices))
+
+    @classmethod
+    def build(cls, corpus, metadata_path=FOLIO_METADATA):
+        overrides = load_folio_labels(metadata_path)
+        labels = {field: [] for field in cls.FIELDS}
+        for folio in corpus.folios:
+            row = overrides.get(canonical_folio(folio), {})
+            labels['section'].append((row.get('section') or '').strip() or get_section(folio))
+            labels['currier'].append((row.get('currier') or '').strip() or get_currier(folio))
+        return cls(corpus, labels)
+
+    def label(self, field, folio):
+        """Label of one folio, e.g. index.label('section', '57v')."""
+        return self.labels[field][self._position[folio]]
+
+    def groups(self, field):
+        """Label names for a field, in manuscript order of first appearance."""
+        return [label for f, label in self._groups if f == field]
+
+    def folios_in(self, field, label):
+        """Folio indices (sorted) carrying a label; empty if none."""
+        return self._groups.get((field, label), (np.empty(0, dtype=np.intp), []))[0]
+
+    def line_ranges(self, field, label):
+        """Merged (lo, hi) line ranges for a label group."""
+        return self._groups.get((field, label), (None, []))[1]
+
+    def line_ranges_for(self, groups):
+        """Line ranges covering several (field, label) groups at once."""
+        folio_indices = np.unique(np.concatenate(
+            [self.folios_in(field, label) for field, label in groups] or [np.empty(0, dtype=np.intp)]))
+        return merge_ranges(self.corpus.line_ranges(folio_indices))
+
+    def tokens(self, field, label):
+        return self.corpus.tokens_in(self.line_ranges(field, label))
+
+    def chars(self, field, label):
+        return self.corpus.chars_in(self.line_ranges(field, label))
@@ -0,0 +1,162 @@
+"""
+Mantel and partial Mantel tests between folio x folio matrices.
+
+A Mantel statistic is the correlation of two matrices' upper triangles,
+and its null permutes the rows and columns of one matrix together.
+Permuting a matrix only reorders its off-diagonal entries, so their mean,
+spread and ranks never change: X is standardised (or ranked, for
+Spearman) once, and each permutation is reduced to a gather of the
+upper-triangle entries plus a dot product with one or two fixed vectors.
+Permutations (stratified or not) are drawn a batch at a time with one
+argsort, and gathered a batch at a time too: one take per row of the
+upper triangle, covering that row for every permutation in the batch,
+followed by one small matrix product with the targets.
+
+Stratified nulls only shuffle folios within their stratum (a manuscript
+section, say), which tests whether the association survives once the
+sections themselves are taken as given.
+"""
+
+from functools import partial
+
+import numpy as np
+from scipy import stats
+
+from permutation import sequential_permutation_test
+
+METHODS = ('pearson', 'spearman')
+
+# Permutations drawn and gathered at once inside a block
+BATCH_SIZE = 128
+
+# Blocks per stopping check; fixed so results never depend on the worker count
+ROUND_BLOCKS = 4
+
+
+def upper_triangle(matrix, indices=None):
+    """Entries above the diagonal of a square matrix, row by row."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError(f"Expected a square matrix, got shape {matrix.shape}")
+    iu, ju = indices if indices is not None else np.triu_indices(len(matrix), 1)
+    return matrix[iu, ju]
+
+
+def _standardize(values, method):
+    """Upper-triangle values as a zero-mean vector of unit RMS (ranked first for Spearman)."""
+    if method == 'spearman':
+        values = stats.rankdata(values)
+    values = np.asarray(values, dtype=np.float64)
+    centered = values - values.mean()
+    scale = np.sqrt(np.mean(centered ** 2))
+    if scale == 0:
+        raise ValueError("Matrix is constant above the diagonal")
+    return centered / scale
+
+
+def _symmetric(values, n, indices):
+    """Square matrix holding values above and below the diagonal."""
+    matrix = np.zeros((n, n))
+    matrix[indices] = values
+    return matrix + matrix.T
+
+
+def strata_permutations(rng, strata, size):
+    """
+    (size, n) permutations that only move items within their stratum.
+
+    Sorting random keys offset by stratum lists each stratum's members in
+    random order; writing them back at the stratum's own positions gives a
+    within-stratum shuffle for every row at once.
+    """
+    strata = np.asarray(strata)
+    n = len(strata)
+    slots = np.argsort(strata, kind='stable')
+    order = np.argsort(strata[None, :] + rng.random((size, n)), axis=1)
+    permutations = np.empty((size, n), dtype=np.intp)
+    permutations[:, slots] = order
+    return permutations
+
+
+def partial_correlation(r_xy, r_xz, r_yz):
+    """First-order partial correlation r_xy.z (vectorised over r_xy, r_xz)."""
+    return (r_xy - r_xz * r_yz) / np.sqrt((1 - r_xz ** 2) * (1 - r_yz ** 2))
+
+
+def _null_block(x, targets, indices, strata, r_yz, size, seed):
+    """Null statistics for one seeded block of permutations of x."""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    flat = x.ravel()
+    # Offset of each upper-triangle row in the row-major triangle
+    row_ends = np.cumsum(np.arange(n - 1, 0, -1))
+    r = np.empty((size, targets.shape[1]))
+    for start in range(0, size, BATCH_SIZE):
+        # One column per permutation: row i of the batch is where item i went
+        perms = strata_permutations(rng, strata, min(BATCH_SIZE, size - start)).T.copy()
+        offsets = perms * n
+        batch = np.zeros((targets.shape[1], perms.shape[1]))
+        lo = 0
+        for i, hi in enumerate(row_ends):
+            # x[perm[i], perm[j]] for all j > i and every permutation at once
+            batch += targets[lo:hi].T @ flat.take(offsets[i] + perms[i + 1:])
+            lo = hi
+        r[start:start + perms.shape[1]] = batch.T
+    r /= len(indices[0])
+    return r[:, 0] if r_yz is None else partial_correlation(r[:, 0], r[:, 1], r_yz)
+
+
+def mantel_test(x, y, z=None, method='pearson', strata=None, alternative='greater',
+                max_trials=100_000, min_trials=1000, block_size=2000, round_blocks=ROUND_BLOCKS,
+                workers=1, seed=None):
+    """
+    (Partial) Mantel test of the association between square matrices x and y.
+
+    Only the upper triangles are used. With z given, the statistic is the
+    partial correlation of x and y controlling for z, and the null permutes
+    x alone (Smouse, Long & Sokal 1986).
+
+    Args:
+        x, y: (n, n) matrices, e.g. image and text similarity between folios
+        z: Optional (n, n) matrix to partial out
+        method: 'pearson' or 'spearman' (Pearson on ranks)
+        strata: Optional label per item; permutations stay within a label,
+                e.g. FolioIndex labels['section'] for SECTION_MAP sections
+        alternative: 'greater' or 'less'
+        max_trials, min_trials, block_size, round_blocks, workers, seed:
+            Passed to sequential_permutation_test. Set min_trials=max_trials
+            to always draw the full number of permutations. A seed gives the
+            same result for any number of workers.
+
+    Returns:
+        PermutationResult; observed is the (partial) Mantel r
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}. Choose from {METHODS}")
+    n = len(x)
+    indices = np.triu_indices(n, 1)
+    matrices = [x, y] if z is None else [x, y, z]
+    if any(len(matrix) != n for matrix in matrices):
+        raise ValueError("All matrices must have the same size")
+    vectors = [_standardize(upper_triangle(matrix, indices), method) for matrix in matrices]
+    strata = np.zeros(n, dtype=np.int64) if strata is None else \
+        np.unique(np.asarray(strata), return_inverse=True)[1].ravel()
+    if len(strata) != n:
+        raise ValueError(f"Expected {n} strata labels, got {len(strata)}")
+
+    m = len(indices[0])
+    r_xy = float(vectors[0] @ vectors[1] / m)
+    if z is None:
+        observed, r_yz = r_xy, None
+        targets = vectors[1][:, None]
+    else:
+        r_xz = float(vectors[0] @ vectors[2] / m)
+        r_yz = float(vectors[1] @ vectors[2] / m)
+        observed = float(partial_correlation(r_xy, r_xz, r_yz))
+        targets = np.column_stack([vectors[1], vectors[2]])
+
+    statistic = partial(_null_block, _symmetric(vectors[0], n, indices), targets, indices, strata, r_yz)
+    return sequential_permutation_test(
+        statistic, observed, alternative=alternative, block_size=block_size,
+        round_blocks=round_blocks, min_trials=min_trials, max_trials=max_trials,
+        workers=workers, seed=seed)
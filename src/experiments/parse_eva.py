@@ -4,7 +4,12 @@ Because someone has to do the tedious work. Might as well be me.
 """
 
 import re
+from array import array
 from collections import defaultdict
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
 
 SECTION_MAP = {
     'botanical': (1, 57),
@@ -13,35 +18,101 @@ SECTION_MAP = {
     'pharmaceutical': (88, 116),
 }
 
-def parse_transcription(filepath):
-    """Parse EVA transcription into {folio: [lines]}."""
-    pages = defaultdict(list)
+# Currier's A/B languages by folio range; folios.csv may override per folio
+CURRIER_MAP = {
+    'A': (1, 57),
+    'B': (88, 116),
+}
+
+# Folio markers like <1r.1>, <57v.3>
+LOCUS_RE = re.compile(r'^<(\d+[rv])\.(\d+)>(.*)')
+
+
+class EvaLine(NamedTuple):
+    """One transcribed line: folio id, locus line number and raw text."""
+    folio: str
+    line_no: int
+    text: str
+
+
+class TranscriptionTable(NamedTuple):
+    """Columnar view of a transcription, one row per transcribed line."""
+    folios: list
+    folio_idx: np.ndarray
+    line_no: np.ndarray
+    text: list
+
+
+def iter_transcription(filepath):
+    """Stream EvaLine records from an EVA transcription in file order.
+
+    Continuation lines (no locus marker) keep the line number of the
+    locus they follow, so nothing is reordered or dropped.
+    """
+    match_locus = LOCUS_RE.match
     current_folio = None
-    
+    line_no = 0
+
     with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            # Match folio markers like <1r.1>, <57v.3>
-            match = re.match(r'^<(\d+[rv])\.(\d+)>(.*)', line)
+            match = match_locus(line)
             if match:
                 current_folio = match.group(1)
+                line_no = int(match.group(2))
                 text = match.group(3).strip()
                 if text:
-                    pages[current_folio].append(text)
-            elif current_folio and not line.startswith('#') and not line.startswith('<'):
-                pages[current_folio].append(line)
-    
+                    yield EvaLine(current_folio, line_no, text)
+            elif current_folio and not line.startswith(('#', '<')):
+                yield EvaLine(current_folio, line_no, line)
+
+
+def read_transcription_table(filepath):
+    """Parse a transcription in one pass into a TranscriptionTable."""
+    folios = []
+    folio_ids = {}
+    folio_idx = array('i')
+    line_no = array('i')
+    text = []
+
+    for record in iter_transcription(filepath):
+        idx = folio_ids.get(record.folio)
+        if idx is None:
+            idx = folio_ids[record.folio] = len(folios)
+            folios.append(record.folio)
+        folio_idx.append(idx)
+        line_no.append(record.line_no)
+        text.append(record.text)
+
+    return TranscriptionTable(
+        folios=folios,
+        folio_idx=np.frombuffer(folio_idx, dtype=np.int32).copy(),
+        line_no=np.frombuffer(line_no, dtype=np.int32).copy(),
+        text=text,
+    )
+
+
+def parse_transcription(filepath):
+    """Parse EVA transcription into {folio: [lines]}."""
+    pages = defaultdict(list)
+    for record in iter_transcription(filepath):
+        pages[record.folio].append(record.text)
     return dict(pages)
 
 
+FOLIO_NUMBER_RE = re.compile(r'(\d+)')
+
+
+@lru_cache(maxsize=None)
 def folio_number(folio_id):
     """Extract numeric part from folio id like '57v' -> 57."""
-    match = re.match(r'(\d+)', folio_id)
+    match = FOLIO_NUMBER_RE.match(folio_id)
     return int(match.group(1)) if match else 0
 
 
+@lru_cache(maxsize=None)
 def get_section(folio_id):
     """Map a folio to its section."""
     num = folio_number(folio_id)
@@ -62,22 +133,28 @@ def get_sections(pages):
 
 def get_section_text(pages, section_name):
     """Get all text for a section as one string."""
-    sections = get_sections(pages)
-    if section_name not in sections:
-        return ''
+    folios = [f for f in pages if get_section(f) == section_name]
     texts = []
-    for folio in sorted(sections[section_name].keys(), key=folio_number):
-        texts.extend(sections[section_name][folio])
+    for folio in sorted(folios, key=folio_number):
+        texts.extend(pages[folio])
     return '\n'.join(texts)
 
 
+# Tokenization settings. These are part of the corpus cache key, so changing
+# any of them invalidates previously cached token arrays.
+LINE_END_RE = re.compile(r'[=\-]$', flags=re.MULTILINE)
+TOKEN_SPLIT_RE = re.compile(r'[.\s,]+')
+TOKEN_CONTENT_RE = re.compile(r'[a-zA-Z0-9]')
+
+
 def tokenize(text):
     """Split text into tokens using . and spaces as delimiters.
     Also strips common annotation characters."""
     # Remove line-end markers and annotations
-    text = re.sub(r'[=\-]$', '', text, flags=re.MULTILINE)
+    text = LINE_END_RE.sub('', text)
     # Split on dots, spaces, commas
-    tokens = re.split(r'[.\s,]+', text)
+    tokens = TOKEN_SPLIT_RE.split(text)
     # Filter empty and pure-punctuation tokens
-    tokens = [t for t in tokens if t and re.search(r'[a-zA-Z0-9]', t)]
+    has_content = TOKEN_CONTENT_RE.search
+    tokens = [t for t in tokens if t and has_content(t)]
     return tokens
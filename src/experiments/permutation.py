@@ -0,0 +1,149 @@
+"""
+Sequential Monte Carlo permutation tests on a process pool.
+
+Trials run in fixed-size blocks, each seeded from its own
+SeedSequence.spawn stream, so the null distribution is bit-identical no
+matter how many workers draw it. After every round of blocks the
+Clopper-Pearson interval of the p-value is checked against alpha, and
+sampling stops as soon as the interval sits clearly on one side.
+Clear results finish fast. Borderline ones keep sampling, which seems fair.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from scipy import stats
+
+
+class PermutationResult(NamedTuple):
+    observed: float
+    p_value: float
+    ci_low: float
+    ci_high: float
+    n_trials: int
+    exceedances: int
+    decision: str          # 'significant', 'not_significant' or 'undecided'
+    entropy: int           # SeedSequence entropy; pass back as seed to reproduce
+    null: np.ndarray
+
+
+def clopper_pearson(k, n, confidence=0.999):
+    """Two-sided Clopper-Pearson interval for k successes in n trials."""
+    tail = (1 - confidence) / 2
+    lo = stats.beta.ppf(tail, k, n - k + 1) if k > 0 else 0.0
+    hi = stats.beta.ppf(1 - tail, k + 1, n - k) if k < n else 1.0
+    return float(lo), float(hi)
+
+
+def count_exceedances(null, observed, alternative='greater'):
+    """Null draws at least as extreme as the observed statistic."""
+    if alternative == 'greater':
+        return int(np.count_nonzero(null >= observed))
+    if alternative == 'less':
+        return int(np.count_nonzero(null <= observed))
+    raise ValueError(f"Unknown alternative: {alternative}")
+
+
+# Per-process statistic, installed once by the pool initializer so large
+# arrays captured by it are pickled once per worker rather than per block.
+_statistic = None
+
+
+def _init_worker(statistic):
+    global _statistic
+    _statistic = statistic
+
+
+def _run_block(size, seed_seq):
+    return np.asarray(_statistic(size, seed_seq), dtype=float)
+
+
+def sequential_permutation_test(
+    statistic,
+    observed,
+    alternative='greater',
+    alpha=0.05,
+    confidence=0.999,
+    block_size=500,
+    round_blocks=8,
+    min_trials=1000,
+    max_trials=1_000_000,
+    workers=None,
+    seed=None,
+):
+    """
+    Run null trials until the p-value is resolved against alpha.
+
+    Args:
+        statistic: Picklable callable (size, seed) -> array of `size` null
+                   statistics; seed is a SeedSequence for np.random.default_rng
+        observed: Observed value of the statistic
+        alternative: 'greater' or 'less'
+        alpha: Significance threshold the p-value is compared against
+        confidence: Confidence level of the stopping interval
+        block_size: Trials per seeded block (the unit of work)
+        round_blocks: Blocks per round; stopping is checked between rounds
+        min_trials: Never stop before this many trials
+        max_trials: Always stop at this many trials
+        workers: Process count (None = all cores, 1 = run in-process)
+        seed: Seed or SeedSequence entropy for reproducible runs
+
+    Returns:
+        PermutationResult; p_value is (exceedances + 1) / (n_trials + 1)
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    workers = workers or os.cpu_count() or 1
+
+    blocks = []
+    n_trials = exceedances = 0
+    decision = 'undecided'
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(statistic,))
+    try:
+        while n_trials < max_trials:
+            sizes = []
+            for _ in range(round_blocks):
+                size = min(block_size, max_trials - n_trials - sum(sizes))
+                if size <= 0:
+                    break
+                sizes.append(size)
+            seeds = root.spawn(len(sizes))
+
+            if executor is None:
+                results = [np.asarray(statistic(size, s), dtype=float) for size, s in zip(sizes, seeds)]
+            else:
+                results = list(executor.map(_run_block, sizes, seeds))
+
+            for null in results:
+                blocks.append(null)
+                n_trials += len(null)
+                exceedances += count_exceedances(null, observed, alternative)
+
+            ci_low, ci_high = clopper_pearson(exceedances, n_trials, confidence)
+            if n_trials >= min_trials:
+                if ci_high < alpha:
+                    decision = 'significant'
+                    break
+                if ci_low > alpha:
+                    decision = 'not_significant'
+                    break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    ci_low, ci_high = clopper_pearson(exceedances, n_trials, confidence)
+    return PermutationResult(
+        observed=float(observed),
+        p_value=(exceedances + 1) / (n_trials + 1),
+        ci_low=ci_low,
+        ci_high=ci_high,
+        n_trials=n_trials,
+        exceedances=exceedances,
+        decision=decision,
+        entropy=root.entropy,
+        null=np.concatenate(blocks) if blocks else np.empty(0),
+    )
@@ -0,0 +1,315 @@
+"""
+Tiny incremental pipeline: experiment stages memoized by content hash.
+
+A stage's cache key hashes its name, its code, its parameters, the
+pipeline source key (the corpus hash) and the content digests of its
+input stages. The code is found by walking the names the stage function
+uses: functions, classes and constants of its own module are hashed one
+by one (source, or value), so a chart tweak in a script only reruns the
+stages that can reach that chart; any other repo module it touches is
+hashed as whole files, with everything those import. Hand-kept lists of
+helpers were always one edit behind. Stages that take a seed but were
+given None are never cached: their result is a fresh random draw every
+time. Change nothing and nothing runs, which is my preferred workload.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import CodeType
+from typing import NamedTuple
+
+STAGE_CACHE_DIR = Path(__file__).parents[2] / 'data/derived/cache/stages'
+
+# Modules whose files live under here count as repo code for cache keys
+SOURCE_ROOT = Path(__file__).resolve().parents[1]
+
+# Global values whose repr is stable across runs and can stand in for them
+PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes, range, Path)
+
+
+class StageReport(NamedTuple):
+    name: str
+    hit: bool
+    seconds: float          # time spent this run (load or compute)
+    compute_seconds: float  # time the stage took when it was last computed
+
+
+def _repo_module(obj):
+    """The repo module defining a module, function or class (None for anything else)."""
+    if not (inspect.ismodule(obj) or inspect.isfunction(obj) or inspect.isclass(obj)):
+        return None
+    module = obj if inspect.ismodule(obj) else sys.modules.get(getattr(obj, '__module__', None) or '')
+    path = getattr(module, '__file__', None)
+    if path is None or not Path(path).resolve().is_relative_to(SOURCE_ROOT):
+        return None
+    return module
+
+
+def module_closure(objects):
+    """
+    Source files of the repo modules defining `objects`, plus every repo
+    module reachable from them through module-level imports.
+
+    Returns:
+        Sorted list of resolved paths
+    """
+    seen = {}
+    stack = [m for m in map(_repo_module, objects) if m is not None]
+    while stack:
+        module = stack.pop()
+        path = Path(module.__file__).resolve()
+        if path in seen:
+            continue
+        seen[path] = module
+        stack.extend(m for m in map(_repo_module, vars(module).values()) if m is not None)
+    return sorted(seen)
+
+
+def _code_names(code):
+    """Global and attribute names used by a code object and everything nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _plain(value):
+    """Stable text for plain data (nested containers included), None for anything else."""
+    if isinstance(value, PLAIN_TYPES):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        items = [_plain(v) for v in value]
+        return None if None in items else f"{type(value).__name__}[{', '.join(items)}]"
+    if isinstance(value, (set, frozenset)):
+        items = [_plain(v) for v in value]
+        return None if None in items else f"set[{', '.join(sorted(items))}]"
+    if isinstance(value, dict):
+        items = [(_plain(k), _plain(v)) for k, v in value.items()]
+        if any(k is None or v is None for k, v in items):
+            return None
+        return f"dict[{', '.join(sorted(f'{k}: {v}' for k, v in items))}]"
+    return None
+
+
+def _module_label(module):
+    """Module name that does not depend on how it was run (a script is '__main__')."""
+    return Path(module.__file__).resolve().relative_to(SOURCE_ROOT).with_suffix('').as_posix()
+
+
+def _file_digest(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def code_digests(objects):
+    """
+    Digest of every piece of repo code `objects` depend on, keyed by what it is.
+
+    Functions and classes are hashed by source, and the globals their code
+    names are followed: same-module functions, classes and plain constants
+    one by one, anything from another repo module as the whole files of
+    module_closure. Unhashable same-module globals count by type only.
+    """
+    digests = {}
+    stack = list(objects)
+    seen = set()
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, functools.partial):
+            stack.append(obj.func)
+            digests[f"partial:{getattr(obj.func, '__qualname__', type(obj.func).__name__)}"] = \
+                _plain((obj.args, obj.keywords)) or type(obj).__name__
+            continue
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        module = _repo_module(obj)
+        if module is None:
+            continue
+        if inspect.ismodule(obj):
+            for path in module_closure((obj,)):
+                digests[f"file:{path.relative_to(SOURCE_ROOT)}"] = _file_digest(path)
+            continue
+        try:
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            stack.append(module)
+            continue
+        label = _module_label(module)
+        digests[f"{label}.{obj.__qualname__}"] = hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+        functions = [obj] if inspect.isfunction(obj) else [
+            inspect.unwrap(getattr(member, '__func__', getattr(member, 'fget', member)))
+            for member in vars(obj).values()
+        ]
+        for func in functions:
+            if not inspect.isfunction(func):
+                continue
+            # Defaults are evaluated at definition time, so their names are not in the code
+            defaults = (func.__defaults__, func.__kwdefaults__)
+            digests[f"{label}.{func.__qualname__}:defaults"] = _plain(defaults) or repr(
+                [type(v).__qualname__ for v in (func.__defaults__ or ())])
+            for name in sorted(_code_names(func.__code__)):
+                if name not in func.__globals__:
+                    continue
+                value = func.__globals__[name]
+                owner = _repo_module(value)
+                if owner is module and not inspect.ismodule(value):
+                    stack.append(value)
+                elif owner is not None:
+                    stack.append(owner)
+                elif not (inspect.ismodule(value) or callable(value)):
+                    digests[f"{label}.{name}"] = _plain(value) or type(value).__qualname__
+    return digests
+
+
+class Stage:
+    """One named computation with declared inputs, parameters and outputs."""
+
+    def __init__(self, name, func, inputs=(), params=None, code=(), outputs=(), runtime=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = dict(params or {})
+        self.runtime = dict(runtime or {})
+        self.code = tuple(code)
+        self.outputs = tuple(Path(p) for p in outputs)
+
+    def code_version(self):
+        digests = code_digests((self.func,) + self.code)
+        return hashlib.sha256(json.dumps(digests, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def seeded(self):
+        """False if func takes a seed and gets None: its result is random and not worth caching."""
+        try:
+            parameters = inspect.signature(self.func).parameters
+        except (TypeError, ValueError):
+            return True
+        if 'seed' not in parameters:
+            return True
+        return self.params.get('seed', parameters['seed'].default) is not None
+
+    def key(self, source, input_digests):
+        payload = json.dumps({
+            'name': self.name,
+            'code': self.code_version(),
+            'params': self.params,
+            'source': source,
+            'inputs': input_digests,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Pipeline:
+    """
+    Ordered DAG of stages; each stage may only depend on earlier ones.
+
+    Outputs are pickled under cache_dir/<pipeline>/ and only unpickled when a
+    downstream stage actually has to run.
+    """
+
+    def __init__(self, name, source='', cache_dir=STAGE_CACHE_DIR):
+        self.name = name
+        self.source = source
+        self.cache_dir = Path(cache_dir) / name
+        self.stages = {}
+
+    def add(self, name, func, inputs=(), params=None, code=(), outputs=(), runtime=None):
+        """
+        Register a stage.
+
+        func(*input_values, **params, **runtime) must return a picklable
+        value. params are part of the cache key; runtime options (worker
+        counts and the like) are not, so they must not change the result.
+        Everything func's code can reach by name is part of the key already
+        (see code_digests); code only needs to name callables func cannot
+        reach that way (lazy imports, say). outputs
+        lists files the stage writes, which must exist for a cached result
+        to count.
+        """
+        missing = [i for i in inputs if i not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name!r} depends on unknown stages: {missing}")
+        self.stages[name] = Stage(name, func, inputs, params, code, outputs, runtime)
+        return self
+
+    def _paths(self, stage, key):
+        stem = self.cache_dir / f"{stage.name}-{key[:16]}"
+        return stem.with_suffix('.pkl'), stem.with_suffix('.json')
+
+    def _store(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def run(self, verbose=True):
+        """Run all stages, reusing cached ones. Returns (values, reports)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        values, pending, digests, reports = {}, {}, {}, []
+
+        def value(name):
+            if name not in values:
+                with open(pending.pop(name), 'rb') as f:
+                    values[name] = pickle.load(f)
+            return values[name]
+
+        for stage in self.stages.values():
+            key = stage.key(self.source, [digests[i] for i in stage.inputs])
+            value_path, meta_path = self._paths(stage, key)
+            start = time.perf_counter()
+
+            cacheable = stage.seeded()
+            if (cacheable and value_path.exists() and meta_path.exists()
+                    and all(p.exists() for p in stage.outputs)):
+                meta = json.loads(meta_path.read_text())
+                pending[stage.name] = value_path
+                digests[stage.name] = meta['digest']
+                reports.append(StageReport(stage.name, True, time.perf_counter() - start, meta['seconds']))
+            else:
+                result = stage.func(*[value(i) for i in stage.inputs], **stage.params, **stage.runtime)
+                seconds = time.perf_counter() - start
+                blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+                digest = hashlib.sha256(blob).hexdigest()
+                if cacheable:
+                    self._store(value_path, blob)
+                    self._store(meta_path, json.dumps({'digest': digest, 'seconds': seconds}).encode('utf-8'))
+                values[stage.name] = result
+                digests[stage.name] = digest
+                reports.append(StageReport(stage.name, False, seconds, seconds))
+
+        if verbose:
+            print_report(self.name, reports)
+        return _LazyValues(value, self.stages), reports
+
+
+class _LazyValues:
+    """Mapping-style access to stage values, unpickling on first use."""
+
+    def __init__(self, loader, stages):
+        self._loader = loader
+        self._stages = stages
+
+    def __getitem__(self, name):
+        if name not in self._stages:
+            raise KeyError(name)
+        return self._loader(name)
+
+
+def print_report(name, reports):
+    hits = [r for r in reports if r.hit]
+    saved = sum(r.compute_seconds - r.seconds for r in hits)
+    print(f"Pipeline {name}: {len(hits)} cached, {len(reports) - len(hits)} recomputed, "
+          f"~{saved:.2f}s saved")
+    for r in reports:
+        status = 'hit ' if r.hit else 'miss'
+        print(f"  [{status}] {r.name:<20} {r.seconds:7.3f}s"
+              + (f"  (was {r.compute_seconds:.3f}s)" if r.hit else ''))
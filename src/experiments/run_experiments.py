@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Run any subset of the experiments concurrently from one entry point.
+
+The corpus cache is built (or validated) once in the parent process and
+opened by memory map; forked workers inherit the mapping instead of
+re-parsing or receiving pickled text. Each experiment still writes to its
+own experiments/0N-*/ directory, so a full refresh takes as long as the
+slowest experiment. I'll be here, waiting. As usual.
+"""
+
+import contextlib
+import importlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from corpus import TRANSCRIPTION, Corpus
+
+# Experiment name -> module with a main() entry point
+EXPERIMENTS = {
+    '01-compression': 'exp01_compression',
+    '02-cooccurrence': 'exp02_cooccurrence',
+    '03-currier-ab': 'exp03_currier_ab',
+}
+
+
+def run_experiment(name, kwargs):
+    """Run one experiment's main(); returns (name, seconds, captured output)."""
+    module = importlib.import_module(EXPERIMENTS[name])
+    buffer = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(buffer):
+        module.main(**kwargs)
+    return name, time.perf_counter() - start, buffer.getvalue()
+
+
+def run_experiments(names=None, jobs=None, options=None):
+    """
+    Run experiments concurrently on a process pool.
+
+    Args:
+        names: Experiment names (keys of EXPERIMENTS); None = all
+        jobs: Worker processes (None = one per experiment, capped at cores)
+        options: {name: kwargs for that experiment's main()}
+
+    Returns:
+        {name: seconds}
+    """
+    names = list(names or EXPERIMENTS)
+    unknown = [n for n in names if n not in EXPERIMENTS]
+    if unknown:
+        raise ValueError(f"Unknown experiments: {unknown}. Choose from {list(EXPERIMENTS)}")
+    options = options or {}
+    jobs = jobs or min(len(names), os.cpu_count() or 1)
+
+    # Parse once here; workers inherit (fork) or mmap (spawn) the cached arrays
+    Corpus.load(TRANSCRIPTION)
+
+    timings = {}
+    start = time.perf_counter()
+    if jobs == 1:
+        results = (run_experiment(n, options.get(n, {})) for n in names)
+        for name, seconds, output in results:
+            timings[name] = seconds
+            _report(name, seconds, output)
+    else:
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+            futures = [executor.submit(run_experiment, n, options.get(n, {})) for n in names]
+            for future in as_completed(futures):
+                name, seconds, output = future.result()
+                timings[name] = seconds
+                _report(name, seconds, output)
+
+    wall = time.perf_counter() - start
+    print(f"\nRan {len(names)} experiment(s) in {wall:.2f}s wall time "
+          f"({sum(timings.values()):.2f}s if run one after another)")
+    return timings
+
+
+def _report(name, seconds, output):
+    print(f"=== {name} ({seconds:.2f}s) ===")
+    print(output.rstrip())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run Voynich experiments concurrently')
+    parser.add_argument('experiments', nargs='*', default=None,
+                        help=f"Experiments to run (default: all of {', '.join(EXPERIMENTS)})")
+    parser.add_argument('--jobs', type=int, default=None, help='Concurrent experiments')
+    parser.add_argument('--null-workers', type=int, default=None,
+                        help='Worker processes for the exp03 null model')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed for the exp03 null model (default: the experiment\'s fixed seed)')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Draw a fresh, unseeded exp03 null model (never cached)')
+    args = parser.parse_args()
+
+    exp03 = {'workers': args.null_workers}
+    if args.fresh:
+        exp03['seed'] = None
+    elif args.seed is not None:
+        exp03['seed'] = args.seed
+    run_experiments(
+        args.experiments or None,
+        jobs=args.jobs,
+        options={'03-currier-ab': exp03},
+    )
@@ -0,0 +1,200 @@
+"""
+All-pairs Jaccard similarity between the rows of a sparse incidence matrix.
+
+Two modes:
+
+- exact: intersections of every pair come out of one sparse binary
+  product B B^T, unions from the row sizes. Only pairs sharing at least
+  one token are ever materialised.
+- approximate: MinHash signatures (universal hashing, one
+  np.minimum.reduceat per hash function) banded for locality-sensitive
+  hashing. Candidate pairs are verified exactly, so the output has no
+  false positives, only the occasional miss.
+
+Rows are usually folios, but anything with a set of token ids will do.
+Tens of thousands of pages, all equally unreadable.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+from scipy import sparse
+
+# Mersenne prime for universal hashing; a * x + b stays inside int64
+HASH_PRIME = (1 << 31) - 1
+EMPTY_HASH = np.iinfo(np.int64).max
+
+
+class SimilarPairs(NamedTuple):
+    left: np.ndarray       # row index, left < right
+    right: np.ndarray
+    jaccard: np.ndarray
+
+
+def binary_rows(incidence):
+    """CSR copy of a matrix with every stored entry set to 1."""
+    binary = sparse.csr_matrix(incidence, dtype=np.float64, copy=True)
+    binary.eliminate_zeros()
+    binary.sum_duplicates()
+    binary.data[:] = 1
+    return binary
+
+
+def sets_to_incidence(token_sets, num_tokens=None):
+    """Binary CSR matrix with one row per sorted token id array."""
+    token_sets = [np.asarray(t, dtype=np.int64) for t in token_sets]
+    indptr = np.concatenate([[0], np.cumsum([len(t) for t in token_sets])])
+    indices = np.concatenate(token_sets) if token_sets else np.empty(0, dtype=np.int64)
+    if num_tokens is None:
+        num_tokens = int(indices.max()) + 1 if len(indices) else 0
+    return sparse.csr_matrix((np.ones(len(indices)), indices, indptr),
+                             shape=(len(token_sets), num_tokens))
+
+
+def jaccard_matrix(incidence, dense=None):
+    """
+    Exact Jaccard similarity of every pair of rows.
+
+    Args:
+        incidence: Sparse (rows, tokens) matrix; nonzero entries count as members
+        dense: Return a dense array (default: when there are at most 5000 rows)
+
+    Returns:
+        (rows, rows) array, or CSR matrix holding only pairs that intersect.
+        The diagonal is 1 for non-empty rows and 0 for empty ones.
+    """
+    binary = binary_rows(incidence)
+    sizes = np.diff(binary.indptr).astype(np.float64)
+    intersection = (binary @ binary.T).tocoo()
+    union = sizes[intersection.row] + sizes[intersection.col] - intersection.data
+    values = np.divide(intersection.data, union, out=np.zeros_like(union), where=union > 0)
+    result = sparse.csr_matrix((values, (intersection.row, intersection.col)), shape=intersection.shape)
+    if dense is None:
+        dense = binary.shape[0] <= 5000
+    return result.toarray() if dense else result
+
+
+def pair_jaccard(incidence, left, right):
+    """Exact Jaccard of selected row pairs, without the all-pairs product."""
+    binary = binary_rows(incidence)
+    left, right = np.asarray(left), np.asarray(right)
+    if not len(left):
+        return np.empty(0)
+    sizes = np.diff(binary.indptr).astype(np.float64)
+    intersection = np.asarray(binary[left].multiply(binary[right]).sum(axis=1)).ravel()
+    union = sizes[left] + sizes[right] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(union), where=union > 0)
+
+
+def minhash_signatures(incidence, num_perm=128, seed=None, chunk=32):
+    """
+    MinHash signature of every row: (rows, num_perm) int64.
+
+    Hash function i maps token t to (a_i * t + b_i) mod HASH_PRIME. The
+    row minimum is a np.minimum.reduceat over the CSR index array, done
+    `chunk` hash functions at a time to bound memory. Empty rows get
+    EMPTY_HASH everywhere.
+    """
+    binary = binary_rows(incidence)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, HASH_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, HASH_PRIME, size=num_perm, dtype=np.int64)
+
+    num_rows = binary.shape[0]
+    signatures = np.full((num_rows, num_perm), EMPTY_HASH, dtype=np.int64)
+    indices = binary.indices.astype(np.int64)
+    nonempty = np.flatnonzero(np.diff(binary.indptr))
+    if not len(indices):
+        return signatures
+    starts = binary.indptr[nonempty]
+    for lo in range(0, num_perm, chunk):
+        hi = min(lo + chunk, num_perm)
+        hashed = (a[lo:hi, None] * indices[None, :] + b[lo:hi, None]) % HASH_PRIME
+        signatures[nonempty, lo:hi] = np.minimum.reduceat(hashed, starts, axis=1).T
+    return signatures
+
+
+def minhash_jaccard(signatures, left, right):
+    """Estimated Jaccard of row pairs: fraction of agreeing signature slots."""
+    return np.mean(signatures[left] == signatures[right], axis=1)
+
+
+def lsh_parameters(num_perm, threshold):
+    """Bands x rows = num_perm whose S-curve midpoint (1/b)^(1/r) is nearest threshold."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def lsh_candidates(signatures, bands, rows_per_band=None):
+    """
+    Row pairs that share a bucket in at least one band.
+
+    Returns:
+        (left, right) index arrays, left < right, unique pairs
+    """
+    num_rows, num_perm = signatures.shape
+    rows_per_band = rows_per_band or num_perm // bands
+    if bands * rows_per_band > num_perm:
+        raise ValueError(f"{bands} bands x {rows_per_band} rows exceed {num_perm} hashes")
+    nonempty = np.flatnonzero(signatures[:, 0] != EMPTY_HASH)
+
+    pairs = []
+    for band in range(bands):
+        block = signatures[nonempty, band * rows_per_band:(band + 1) * rows_per_band]
+        _, bucket = np.unique(block, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        order = np.argsort(bucket, kind='stable')
+        bucket_sorted = bucket[order]
+        bounds = np.flatnonzero(np.diff(bucket_sorted)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(bucket_sorted)]])
+        for lo, hi in zip(starts.tolist(), ends.tolist()):
+            if hi - lo < 2:
+                continue
+            members = nonempty[order[lo:hi]]
+            i, j = np.triu_indices(hi - lo, k=1)
+            pairs.append(np.stack([members[i], members[j]], axis=1))
+
+    if not pairs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    pairs = np.unique(pairs, axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def exact_similar_pairs(incidence, threshold=0.5):
+    """All row pairs with Jaccard >= threshold, from the exact sparse product."""
+    jaccard = sparse.triu(jaccard_matrix(incidence, dense=False), k=1).tocoo()
+    keep = jaccard.data >= threshold
+    return SimilarPairs(jaccard.row[keep], jaccard.col[keep], jaccard.data[keep])
+
+
+def near_duplicates(incidence, threshold=0.5, num_perm=128, bands=None, seed=None,
+                    signatures=None):
+    """
+    Row pairs with Jaccard >= threshold via MinHash + LSH.
+
+    Args:
+        incidence: Sparse (rows, tokens) matrix
+        threshold: Jaccard similarity a pair must reach
+        num_perm: Hash functions per signature
+        bands: LSH bands (default: chosen from threshold by lsh_parameters)
+        seed: Hash function seed
+        signatures: Precomputed minhash_signatures (skips hashing)
+
+    Returns:
+        SimilarPairs sorted by decreasing Jaccard, verified exactly
+    """
+    if signatures is None:
+        signatures = minhash_signatures(incidence, num_perm, seed)
+    num_perm = signatures.shape[1]
+    if bands is None:
+        bands, rows_per_band = lsh_parameters(num_perm, threshold)
+    else:
+        rows_per_band = num_perm // bands
+    left, right = lsh_candidates(signatures, bands, rows_per_band)
+    jaccard = pair_jaccard(incidence, left, right)
+    keep = jaccard >= threshold
+    left, right, jaccard = left[keep], right[keep], jaccard[keep]
+    order = np.lexsort((right, left, -jaccard))
+    return SimilarPairs(left[order], right[order], jaccard[order])
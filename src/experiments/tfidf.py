@@ -0,0 +1,198 @@
+"""
+TF-IDF folio vectors and their cosine similarities, cached on disk.
+
+Terms are whole tokens, or character n-grams of tokens (padded with ^ and
+$ so prefixes and suffixes count as their own grams). Char n-gram counts
+never touch the running text: each vocabulary entry is split into grams
+once, and folio x gram counts are the sparse product (folio x token) @
+(token x gram).
+
+The sparse matrix and the dense folio x folio cosine matrix are saved as
+plain .npy files keyed by the transcription hash and the settings, and
+opened with mmap_mode, so every notebook and worker process shares one
+copy. Weighting a few hundred folios is quick; finding out that a
+notebook already did it is quicker.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from scipy import sparse
+
+from corpus import TRANSCRIPTION, Corpus, corpus_key
+
+TFIDF_DIR = Path(__file__).parents[2] / 'data/derived/cache/tfidf'
+
+# Bump when the weighting or the layout changes.
+TFIDF_VERSION = 1
+
+ANALYZERS = ('word', 'char')
+ARRAY_NAMES = ('folios', 'features', 'data', 'indices', 'indptr', 'shape', 'idf', 'cosine')
+
+
+class TfidfMatrix(NamedTuple):
+    folios: np.ndarray       # folio name per row
+    features: np.ndarray     # token or n-gram per column
+    matrix: sparse.csr_matrix  # (folios, features) L2-normalised TF-IDF rows
+    idf: np.ndarray          # idf per feature
+    cosine: np.ndarray       # (folios, folios) cosine similarity
+
+    def most_similar(self, folio, k=10):
+        """The k folios with the highest cosine similarity to one folio, as (folio, score)."""
+        i = int(np.flatnonzero(self.folios == folio)[0])
+        scores = np.array(self.cosine[i], dtype=np.float64)
+        scores[i] = -np.inf
+        k = min(k, len(scores) - 1)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((best, -scores[best]))]
+        return [(str(self.folios[j]), float(scores[j])) for j in best]
+
+
+def tfidf_settings(analyzer='word', ngram_range=(2, 4), sublinear_tf=True):
+    if analyzer not in ANALYZERS:
+        raise ValueError(f"Unknown analyzer: {analyzer}. Choose from {ANALYZERS}")
+    return {
+        'version': TFIDF_VERSION,
+        'analyzer': analyzer,
+        'ngram_range': list(ngram_range) if analyzer == 'char' else None,
+        'sublinear_tf': bool(sublinear_tf),
+    }
+
+
+def folio_token_counts(corpus):
+    """Sparse (folios, vocab) token counts."""
+    folio_of_line = np.repeat(np.arange(len(corpus.folios)), np.diff(corpus.folio_line_offsets))
+    folio_of_token = folio_of_line[np.repeat(np.arange(corpus.num_lines), np.diff(corpus.line_token_offsets))]
+    tokens = np.asarray(corpus.tokens)
+    counts = sparse.csr_matrix((np.ones(len(tokens)), (folio_of_token, tokens)),
+                               shape=(len(corpus.folios), len(corpus.vocab)))
+    counts.sum_duplicates()
+    return counts
+
+
+def token_ngrams(vocab, ngram_range=(2, 4)):
+    """
+    Sparse (vocab, grams) counts of padded character n-grams per token.
+
+    Returns:
+        (matrix, gram names sorted)
+    """
+    lo, hi = ngram_range
+    rows, grams = [], []
+    for i, token in enumerate(str(t) for t in vocab):
+        padded = f"^{token}$"
+        for n in range(lo, hi + 1):
+            for start in range(len(padded) - n + 1):
+                rows.append(i)
+                grams.append(padded[start:start + n])
+    names, cols = np.unique(np.array(grams), return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(rows)), (np.array(rows), cols.ravel())),
+                               shape=(len(vocab), len(names)))
+    matrix.sum_duplicates()
+    return matrix, names
+
+
+def tfidf_weights(counts, sublinear_tf=True):
+    """
+    L2-normalised TF-IDF rows of a sparse count matrix.
+
+    tf is 1 + ln(count) when sublinear, else the raw count; idf is the
+    smoothed ln((1 + N) / (1 + df)) + 1, so no term ever weighs zero.
+
+    Returns:
+        (csr matrix, idf)
+    """
+    weights = sparse.csr_matrix(counts, dtype=np.float64, copy=True)
+    weights.eliminate_zeros()
+    num_rows = weights.shape[0]
+    df = np.bincount(weights.indices, minlength=weights.shape[1])
+    idf = np.log((1 + num_rows) / (1 + df)) + 1
+    if sublinear_tf:
+        weights.data = 1 + np.log(weights.data)
+    weights.data *= idf[weights.indices]
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    weights.data *= np.repeat(scale, np.diff(weights.indptr))
+    return weights, idf
+
+
+def build_tfidf(corpus, analyzer='word', ngram_range=(2, 4), sublinear_tf=True):
+    """TF-IDF matrix and cosine similarities for every folio of a Corpus."""
+    tfidf_settings(analyzer, ngram_range, sublinear_tf)
+    counts = folio_token_counts(corpus)
+    features = np.asarray(corpus.vocab)
+    if analyzer == 'char':
+        grams, features = token_ngrams(corpus.vocab, ngram_range)
+        counts = (counts @ grams).tocsr()
+    matrix, idf = tfidf_weights(counts, sublinear_tf)
+    cosine = np.clip((matrix @ matrix.T).toarray(), 0.0, 1.0)
+    return TfidfMatrix(np.asarray(corpus.folios), features, matrix, idf, cosine)
+
+
+def tfidf_key(filepath=TRANSCRIPTION, **settings):
+    sha256 = hashlib.sha256(corpus_key(filepath).encode('utf-8'))
+    sha256.update(json.dumps(tfidf_settings(**settings), sort_keys=True).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def save_tfidf(tfidf, cache_path):
+    """Write the matrix as .npy files, atomically replacing cache_path."""
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    matrix = tfidf.matrix
+    arrays = {
+        'folios': np.asarray(tfidf.folios).astype(str),
+        'features': np.asarray(tfidf.features).astype(str),
+        'data': matrix.data,
+        'indices': matrix.indices,
+        'indptr': matrix.indptr,
+        'shape': np.array(matrix.shape, dtype=np.int64),
+        'idf': tfidf.idf,
+        'cosine': tfidf.cosine,
+    }
+    tmp_dir = Path(tempfile.mkdtemp(prefix=cache_path.name + '.', dir=cache_path.parent))
+    try:
+        for name in ARRAY_NAMES:
+            np.save(tmp_dir / f'{name}.npy', arrays[name], allow_pickle=False)
+        os.replace(tmp_dir, cache_path)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process won the race; its copy is identical
+        if not (cache_path / 'cosine.npy').exists():
+            raise
+
+
+def load_tfidf(filepath=TRANSCRIPTION, analyzer='word', ngram_range=(2, 4), sublinear_tf=True,
+               cache_dir=TFIDF_DIR, mmap_mode='r'):
+    """
+    Cached TF-IDF for a transcription, building it on a miss.
+
+    Args:
+        filepath: EVA transcription
+        analyzer: 'word' (tokens) or 'char' (padded character n-grams of tokens)
+        ngram_range: (min, max) n for the char analyzer
+        sublinear_tf: Use 1 + ln(tf) instead of raw counts
+        cache_dir: Cache root
+        mmap_mode: Passed to np.load; the CSR arrays and the cosine matrix
+                   stay memory-mapped unless this is None
+
+    Returns:
+        TfidfMatrix
+    """
+    settings = {'analyzer': analyzer, 'ngram_range': tuple(ngram_range), 'sublinear_tf': sublinear_tf}
+    cache_path = Path(cache_dir) / tfidf_key(filepath, **settings)
+    if not (cache_path / 'cosine.npy').exists():
+        save_tfidf(build_tfidf(Corpus.load(filepath), **settings), cache_path)
+    arrays = {
+        name: np.load(cache_path / f'{name}.npy', mmap_mode=mmap_mode, allow_pickle=False)
+        for name in ARRAY_NAMES
+    }
+    matrix = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                               shape=tuple(int(s) for s in arrays['shape']), copy=False)
+    return TfidfMatrix(arrays['folios'], arrays['features'], matrix, arrays['idf'], arrays['cosine'])
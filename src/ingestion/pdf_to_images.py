@@ -7,15 +7,30 @@ This script:
 2. Converts PPM to PNG/JPEG
 3. Renames files to canonical folio format (f001r, f001v, etc.)
 
+Conversion runs on a process pool and is resumable: an output that
+already opens cleanly and is newer than its PPM is left alone, and new
+outputs are written to a temporary file and renamed into place, so an
+interrupted run never leaves a truncated image behind.
+
 Design principle: Images are first-class citizens. This transformation
 is reversible via the mapping file.
 """
 
 import os
 import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
 from PIL import Image
 
+# zlib level for PNG: 1 is fast with slightly larger files, 9 is slow and small.
+# Lossless either way, so the choice only trades CPU for disk.
+PNG_COMPRESS_LEVEL = 6
+JPEG_QUALITY = 95
+
 
 # Folio mapping: page_index -> folio_name
 # Format: {page_number: folio_name}
@@ -59,17 +74,117 @@ def create_folio_mapping(num_pages: int) -> dict:
     return mapping
 
 
-def convert_ppm_to_png(ppm_path: Path, png_path: Path):
+def save_options(
+    output_format: str,
+    compress_level: int = PNG_COMPRESS_LEVEL,
+    optimize: bool = False,
+    quality: int = JPEG_QUALITY,
+) -> Tuple[str, dict]:
+    """PIL format name and save() keyword arguments for an output format."""
+    output_format = output_format.lower()
+    if output_format == 'png':
+        return 'PNG', {'compress_level': compress_level, 'optimize': optimize}
+    if output_format in ('jpg', 'jpeg'):
+        return 'JPEG', {'quality': quality, 'optimize': optimize}
+    raise ValueError(f"Unsupported format: {output_format}")
+
+
+def is_current(output_path: Path, source_path: Path) -> bool:
+    """Whether output_path is a readable image at least as new as its source."""
+    output_path = Path(output_path)
+    if not output_path.exists():
+        return False
+    if output_path.stat().st_mtime_ns < Path(source_path).stat().st_mtime_ns:
+        return False
+    try:
+        with Image.open(output_path) as img:
+            img.verify()
+    except Exception:
+        return False
+    return True
+
+
+def convert_page(
+    ppm_path: Path,
+    output_path: Path,
+    pil_format: str,
+    options: dict,
+) -> dict:
+    """
+    Convert one PPM to PNG/JPEG atomically.
+
+    Returns:
+        Dict with source, output, bytes_in, bytes_out and seconds
+    """
+    ppm_path, output_path = Path(ppm_path), Path(output_path)
+    start = time.perf_counter()
+    tmp = output_path.with_name(output_path.name + '.tmp')
+    try:
+        with open(tmp, 'wb') as f, Image.open(ppm_path) as img:
+            img.save(f, pil_format, **options)
+        os.replace(tmp, output_path)
+    except BaseException:
+        # open() itself may have failed, leaving nothing to clean up
+        if tmp.exists():
+            os.unlink(tmp)
+        raise
+    return {
+        'source': ppm_path.name,
+        'output': output_path.name,
+        'bytes_in': ppm_path.stat().st_size,
+        'bytes_out': output_path.stat().st_size,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def convert_ppm_to_png(ppm_path: Path, png_path: Path, compress_level: int = PNG_COMPRESS_LEVEL):
     """Convert PPM to PNG using PIL (lossless)."""
-    img = Image.open(ppm_path)
-    img.save(png_path, 'PNG', lossless=True)
+    convert_page(ppm_path, png_path, *save_options('png', compress_level))
     return png_path
 
 
+def iter_conversions(
+    jobs: List[Tuple[Path, Path]],
+    pil_format: str,
+    options: dict,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Convert (ppm_path, output_path) pairs on a process pool, in input order.
+
+    At most max_in_flight pages (default: 2 per worker) are submitted but
+    not yet consumed, so memory stays flat however many pages there are.
+
+    Yields:
+        convert_page results
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for ppm_path, output_path in jobs:
+            yield convert_page(ppm_path, output_path, pil_format, options)
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for ppm_path, output_path in jobs:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(convert_page, ppm_path, output_path, pil_format, options))
+        while pending:
+            yield pending.popleft().result()
+
+
 def rename_to_folio_names(
     images_dir: Path,
     output_format: str = 'png',
-    mapping: dict = None
+    mapping: dict = None,
+    workers: Optional[int] = None,
+    compress_level: int = PNG_COMPRESS_LEVEL,
+    optimize: bool = False,
+    quality: int = JPEG_QUALITY,
+    force: bool = False,
 ):
     """
     Rename extracted page images to canonical folio names.
@@ -79,6 +194,11 @@ def rename_to_folio_names(
         output_format: 'png' or 'jpg'
         mapping: Dict mapping page_index -> folio_name
                  If None, generates default mapping
+        workers: Worker processes (None = all cores)
+        compress_level: PNG zlib level 0-9
+        optimize: Extra PNG/JPEG optimisation pass (slower, smaller)
+        quality: JPEG quality 1-95
+        force: Reconvert even if an output is already up to date
     """
     images_dir = Path(images_dir)
     
@@ -94,7 +214,11 @@ def rename_to_folio_names(
         print(f"Generated default folio mapping for {len(ppm_files)} pages")
         print("WARNING: Verify this mapping against actual manuscript structure!")
     
-    # Convert and rename
+    pil_format, options = save_options(output_format, compress_level, optimize, quality)
+    
+    # Collect conversions, skipping outputs left by an earlier run
+    jobs = []
+    skipped = 0
     for ppm_file in ppm_files:
         # Extract page number from filename (e.g., "page-000.ppm" -> 0)
         page_num = int(ppm_file.stem.split('-')[1])
@@ -106,16 +230,29 @@ def rename_to_folio_names(
         folio_name = mapping[page_num]
         output_path = images_dir / f"{folio_name}.{output_format}"
         
-        # Convert PPM to PNG/JPEG
-        if output_format.lower() == 'png':
-            convert_ppm_to_png(ppm_file, output_path)
-        elif output_format.lower() in ('jpg', 'jpeg'):
-            img = Image.open(ppm_file)
-            img.save(output_path, 'JPEG', quality=95)
-        else:
-            raise ValueError(f"Unsupported format: {output_format}")
-        
-        print(f"Converted: {ppm_file.name} -> {output_path.name}")
+        if not force and is_current(output_path, ppm_file):
+            skipped += 1
+            continue
+        jobs.append((ppm_file, output_path))
+    
+    print(f"Up to date: {skipped}, to convert: {len(jobs)}")
+    
+    # Convert PPM to PNG/JPEG
+    start = time.perf_counter()
+    total_in = total_out = 0
+    for result in iter_conversions(jobs, pil_format, options, workers):
+        total_in += result['bytes_in']
+        total_out += result['bytes_out']
+        rate = result['bytes_in'] / max(result['seconds'], 1e-9) / 1e6
+        print(f"Converted: {result['source']} -> {result['output']} "
+              f"({result['seconds']:.2f}s, {rate:.1f} MB/s, "
+              f"{result['bytes_out'] / max(result['bytes_in'], 1):.0%} of input)")
+    
+    if jobs:
+        elapsed = time.perf_counter() - start
+        print(f"\nConverted {len(jobs)} pages in {elapsed:.1f}s "
+              f"({len(jobs) / elapsed:.2f} pages/s, {total_in / elapsed / 1e6:.1f} MB/s, "
+              f"{total_in / 1e6:.0f} MB -> {total_out / 1e6:.0f} MB)")
     
     # Save mapping file for reversibility
     mapping_file = images_dir / 'folio_mapping.txt'
@@ -157,6 +294,36 @@ if __name__ == '__main__':
         default=None,
         help='Path to custom mapping file (page_index:folio_name)'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes (default: all cores)'
+    )
+    parser.add_argument(
+        '--compress-level',
+        type=int,
+        default=PNG_COMPRESS_LEVEL,
+        choices=range(10),
+        metavar='0-9',
+        help='PNG zlib compression level (1 = fast, 9 = smallest)'
+    )
+    parser.add_argument(
+        '--optimize',
+        action='store_true',
+        help='Extra PNG/JPEG optimisation pass (slower, smaller files)'
+    )
+    parser.add_argument(
+        '--quality',
+        type=int,
+        default=JPEG_QUALITY,
+        help='JPEG quality (1-95)'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Reconvert pages whose output is already up to date'
+    )
     
     args = parser.parse_args()
     
@@ -174,6 +341,11 @@ if __name__ == '__main__':
     rename_to_folio_names(
         Path(args.images_dir),
         output_format=args.format,
-        mapping=mapping
+        mapping=mapping,
+        workers=args.workers,
+        compress_level=args.compress_level,
+        optimize=args.optimize,
+        quality=args.quality,
+        force=args.force,
     )
 
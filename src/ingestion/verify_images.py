@@ -9,23 +9,109 @@ Checks:
 - Resolution consistency
 - Generate checksum manifest
 
+The manifest (manifest.csv) records size, mtime and hash per file and is
+reused on the next run: files whose size and mtime are unchanged are not
+read at all. `--verify` checks the directory against the stored manifest
+by hash alone, without decoding any pixels.
+
 Design principle: Protect against subtle corruption. This is a one-time
 verification that ensures data integrity.
+
+Each image is read from disk once, hashed from those bytes and decoded
+once; blankness and brightness come from a 256-bin histogram of the
+grayscale array. Images are spread over a process pool with a bounded
+number in flight, so memory stays flat however large the scans are.
 """
 
 import hashlib
+import io
+import mmap
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
 from PIL import Image
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).parents[1]))
+from utils.io import find_folio_images
+
+# Mean gray level above which a page counts as blank (very light)
+BLANK_BRIGHTNESS = 240
+
+MANIFEST_NAME = 'manifest.csv'
+CHECKSUM_NAME = 'checksums.sha256'
+
 
 def calculate_checksum(file_path: Path) -> str:
-    """Calculate SHA256 checksum of a file."""
-    sha256 = hashlib.sha256()
+    """Calculate SHA256 checksum of a file via a read-only memory map."""
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def file_signature(file_path: Path) -> tuple:
+    """(size_bytes, mtime_ns): cheap evidence that a file has not changed."""
+    stat = Path(file_path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_manifest(manifest_path: Path) -> Dict[str, dict]:
+    """Stored manifest rows keyed by filename ({} if there is none)."""
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        return {}
+    manifest_df = pd.read_csv(manifest_path, dtype={'folio': str, 'filename': str})
+    return {row['filename']: row for row in manifest_df.to_dict('records')}
+
+
+def is_unchanged(img_path: Path, row: Optional[dict]) -> bool:
+    """Whether a stored manifest row still describes the file on disk."""
+    if row is None or any(pd.isna(row.get(key)) for key in ('mtime_ns', 'dominant_fraction')):
+        return False
+    size, mtime_ns = file_signature(img_path)
+    return int(row['size_bytes']) == size and int(row['mtime_ns']) == mtime_ns
+
+
+def gray_histogram(img: Image.Image) -> np.ndarray:
+    """256-bin histogram of an image's grayscale pixels."""
+    gray = np.asarray(img.convert('L'))
+    return np.bincount(gray.ravel(), minlength=256)
+
+
+def blank_from_stats(dominant_fraction: float, mean_brightness: float, threshold: float = 0.99) -> bool:
+    """Whether stored histogram stats mark a page as blank under a given threshold."""
+    return float(dominant_fraction) >= threshold or float(mean_brightness) > BLANK_BRIGHTNESS
+
+
+def histogram_stats(histogram: np.ndarray, threshold: float = 0.99) -> dict:
+    """
+    Brightness and blankness from a grayscale histogram.
+
+    Args:
+        histogram: Pixel counts per gray level 0..255
+        threshold: Fraction of pixels that must be same color to be "blank"
+
+    Returns:
+        Dict with mean_brightness, dominant_fraction and is_blank
+    """
+    total = histogram.sum()
+    if total == 0:
+        return {'mean_brightness': 0.0, 'dominant_fraction': 1.0, 'is_blank': True}
+    # Rounded before judging, so a row reused from the manifest gets the same verdict
+    mean_brightness = round(float(np.dot(np.arange(len(histogram)), histogram) / total), 2)
+    dominant_fraction = round(float(histogram.max() / total), 4)
+    return {
+        'mean_brightness': mean_brightness,
+        'dominant_fraction': dominant_fraction,
+        'is_blank': blank_from_stats(dominant_fraction, mean_brightness, threshold),
+    }
 
 
 def is_blank_page(img_path: Path, threshold: float = 0.99) -> bool:
@@ -39,40 +125,137 @@ def is_blank_page(img_path: Path, threshold: float = 0.99) -> bool:
     Returns:
         True if image appears blank
     """
-    img = Image.open(img_path)
-    
-    # Convert to grayscale for analysis
-    gray = img.convert('L')
-    pixels = list(gray.getdata())
-    
-    # Check if most pixels are the same (likely blank)
-    if len(set(pixels)) < len(pixels) * (1 - threshold):
-        return True
-    
-    # Check if image is mostly white/light
-    avg_brightness = sum(pixels) / len(pixels)
-    if avg_brightness > 240:  # Very light
-        return True
-    
-    return False
+    with Image.open(img_path) as img:
+        return histogram_stats(gray_histogram(img), threshold)['is_blank']
 
 
 def get_image_stats(img_path: Path) -> dict:
     """Get basic statistics about an image."""
-    img = Image.open(img_path)
-    return {
-        'width': img.width,
-        'height': img.height,
-        'format': img.format,
-        'mode': img.mode,
-        'size_bytes': img_path.stat().st_size,
+    with Image.open(img_path) as img:
+        return {
+            'width': img.width,
+            'height': img.height,
+            'format': img.format,
+            'mode': img.mode,
+            'size_bytes': img_path.stat().st_size,
+        }
+
+
+def analyze_image(img_path: Path, blank_threshold: float = 0.99) -> dict:
+    """
+    Checksum, header stats and blankness of one image from a single read.
+
+    Args:
+        img_path: Path to image file
+        blank_threshold: See histogram_stats
+
+    Returns:
+        Manifest row for the image
+    """
+    img_path = Path(img_path)
+    _, mtime_ns = file_signature(img_path)
+    data = img_path.read_bytes()
+    with Image.open(io.BytesIO(data)) as img:
+        row = {
+            'folio': img_path.stem,
+            'filename': img_path.name,
+            'checksum_sha256': hashlib.sha256(data).hexdigest(),
+            'width': img.width,
+            'height': img.height,
+            'format': img.format,
+            'mode': img.mode,
+            'size_bytes': len(data),
+            'mtime_ns': mtime_ns,
+        }
+        row.update(histogram_stats(gray_histogram(img), blank_threshold))
+    return row
+
+
+def iter_image_analyses(
+    image_files: List[Path],
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    blank_threshold: float = 0.99,
+) -> Iterator[dict]:
+    """
+    Analyze images on a process pool, yielding rows in input order.
+
+    Args:
+        image_files: Images to analyze
+        workers: Worker processes (None = all cores, 1 = in-process)
+        max_in_flight: Images submitted but not yet consumed (default: 2 per worker)
+        blank_threshold: See histogram_stats
+
+    Yields:
+        analyze_image rows
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for img_path in image_files:
+            yield analyze_image(img_path, blank_threshold)
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for img_path in image_files:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(analyze_image, img_path, blank_threshold))
+        while pending:
+            yield pending.popleft().result()
+
+
+def verify_against_manifest(
+    images_dir: Path,
+    manifest_path: Path = None,
+    workers: Optional[int] = None,
+) -> dict:
+    """
+    Check every image against the stored manifest by hash only.
+
+    Args:
+        images_dir: Directory containing folio images
+        manifest_path: Stored manifest (default: images_dir/manifest.csv)
+        workers: Hashing threads (None = all cores)
+
+    Returns:
+        Dict of filename lists: ok, mismatched, missing, unexpected
+    """
+    images_dir = Path(images_dir)
+    manifest_path = Path(manifest_path) if manifest_path else images_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    if not manifest:
+        raise ValueError(f"No manifest found at {manifest_path}; run without --verify first")
+
+    on_disk = {f.name: f for f in find_folio_images(images_dir, one_per_folio=False)}
+    present = sorted(set(manifest) & set(on_disk))
+    # hashlib releases the GIL on large buffers, so threads are enough here
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as executor:
+        checksums = list(executor.map(calculate_checksum, [on_disk[name] for name in present]))
+
+    report = {
+        'ok': [n for n, c in zip(present, checksums) if c == manifest[n]['checksum_sha256']],
+        'mismatched': [n for n, c in zip(present, checksums) if c != manifest[n]['checksum_sha256']],
+        'missing': sorted(set(manifest) - set(on_disk)),
+        'unexpected': sorted(set(on_disk) - set(manifest)),
     }
 
+    print(f"Verified {len(present)} images against {manifest_path}")
+    print(f"✓ Matching: {len(report['ok'])}")
+    for key, label in (('mismatched', 'Checksum mismatch'), ('missing', 'Missing'),
+                       ('unexpected', 'Not in manifest')):
+        if report[key]:
+            print(f"WARNING: {label} ({len(report[key])}): {', '.join(report[key])}")
+    return report
+
 
 def verify_images(
     images_dir: Path,
     expected_count: int = None,
-    output_manifest: Path = None
+    output_manifest: Path = None,
+    workers: Optional[int] = None,
+    blank_threshold: float = 0.99,
 ):
     """
     Verify integrity of manuscript images.
@@ -81,15 +264,17 @@ def verify_images(
         images_dir: Directory containing folio images
         expected_count: Expected number of images (None = auto-detect)
         output_manifest: Path to save checksum manifest
+                         (default: images_dir/manifest.csv)
+        workers: Worker processes (None = all cores)
+        blank_threshold: Fraction of pixels that must be same color to be "blank"
     """
     images_dir = Path(images_dir)
     
+    if output_manifest is None:
+        output_manifest = images_dir / MANIFEST_NAME
+    
     # Find all image files
-    image_extensions = {'.png', '.jpg', '.jpeg', '.ppm'}
-    image_files = sorted([
-        f for f in images_dir.iterdir()
-        if f.suffix.lower() in image_extensions and f.name.startswith('f')
-    ])
+    image_files = find_folio_images(images_dir, one_per_folio=False)
     
     if not image_files:
         raise ValueError(f"No folio images found in {images_dir}")
@@ -102,36 +287,33 @@ def verify_images(
     else:
         print(f"✓ Image count: {len(image_files)}")
     
+    # Reuse manifest rows for files untouched since the last run; analyze the rest
+    previous = load_manifest(output_manifest)
+    changed = [f for f in image_files if not is_unchanged(f, previous.get(f.name))]
+    print(f"✓ Unchanged since last run: {len(image_files) - len(changed)}, to analyze: {len(changed)}")
+    analyzed = {
+        row['filename']: row
+        for row in iter_image_analyses(changed, workers, blank_threshold=blank_threshold)
+    }
+    
     # Verify each image
     results = []
     blank_pages = []
     resolutions = []
     
     for img_path in image_files:
-        folio_name = img_path.stem
-        
-        # Calculate checksum
-        checksum = calculate_checksum(img_path)
-        
-        # Get image stats
-        stats = get_image_stats(img_path)
-        resolutions.append((stats['width'], stats['height']))
+        row = analyzed.get(img_path.name)
+        if row is None:
+            # The stored verdict may come from another threshold; the stats do not
+            row = dict(previous[img_path.name])
+            row['is_blank'] = blank_from_stats(row['dominant_fraction'], row['mean_brightness'], blank_threshold)
+        resolutions.append((int(row['width']), int(row['height'])))
         
-        # Check if blank
-        if is_blank_page(img_path):
-            blank_pages.append(folio_name)
-            print(f"WARNING: {folio_name} appears to be blank")
+        if row['is_blank']:
+            blank_pages.append(row['folio'])
+            print(f"WARNING: {row['folio']} appears to be blank")
         
-        results.append({
-            'folio': folio_name,
-            'filename': img_path.name,
-            'checksum_sha256': checksum,
-            'width': stats['width'],
-            'height': stats['height'],
-            'format': stats['format'],
-            'size_bytes': stats['size_bytes'],
-            'is_blank': is_blank_page(img_path),
-        })
+        results.append(row)
     
     # Check resolution consistency
     unique_resolutions = set(resolutions)
@@ -147,15 +329,12 @@ def verify_images(
         print("✓ No blank pages detected")
     
     # Save manifest
-    if output_manifest is None:
-        output_manifest = images_dir / 'checksums.sha256'
-    
     manifest_df = pd.DataFrame(results)
     manifest_df.to_csv(output_manifest, index=False)
     print(f"\n✓ Checksum manifest saved to: {output_manifest}")
     
     # Also save in standard checksum format
-    checksum_file = images_dir / 'checksums.sha256'
+    checksum_file = images_dir / CHECKSUM_NAME
     with open(checksum_file, 'w') as f:
         for row in results:
             f.write(f"{row['checksum_sha256']}  {row['filename']}\n")
@@ -199,14 +378,42 @@ if __name__ == '__main__':
         '--output-manifest',
         type=str,
         default=None,
-        help='Path to save checksum manifest CSV'
+        help='Path to the manifest CSV (default: <images-dir>/manifest.csv)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes (default: all cores)'
+    )
+    parser.add_argument(
+        '--blank-threshold',
+        type=float,
+        default=0.99,
+        help='Fraction of same-colored pixels that makes a page blank'
+    )
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='Only check files against the stored manifest (hashes, no decoding)'
     )
     
     args = parser.parse_args()
     
+    if args.verify:
+        report = verify_against_manifest(
+            Path(args.images_dir),
+            manifest_path=Path(args.output_manifest) if args.output_manifest else None,
+            workers=args.workers,
+        )
+        failed = report['mismatched'] or report['missing'] or report['unexpected']
+        raise SystemExit(1 if failed else 0)
+    
     verify_images(
         Path(args.images_dir),
         expected_count=args.expected_count,
-        output_manifest=Path(args.output_manifest) if args.output_manifest else None
+        output_manifest=Path(args.output_manifest) if args.output_manifest else None,
+        workers=args.workers,
+        blank_threshold=args.blank_threshold,
     )
 
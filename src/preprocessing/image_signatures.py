@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Compact perceptual signatures of folio images and the similarities
+between them.
+
+Per folio, two signatures are computed from a small thumbnail:
+- pHash: 64 bits, the signs of the lowest 8x8 DCT coefficients (DC
+  excluded) of a 32x32 grayscale copy relative to their median. Robust to
+  rescaling, mild blur and brightness changes; compared by Hamming distance.
+- Intensity histogram: 64 gray levels, square-rooted and unit-normalised,
+  so a dot product is the cosine of the Hellinger embedding.
+
+Signatures are saved as signatures.npz next to the checksum manifest in
+the images directory and keyed by checksum, so only new or changed
+images are ever read again. All-pairs matrices are a single XOR plus a
+byte-table popcount, and a single matrix product; "most similar to X"
+is one row of either.
+
+Design principle: Pixels are expensive, bits are cheap.
+"""
+
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+from scipy.fft import dctn
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+from utils.io import find_folio_images
+from utils.thumbnails import image_checksum, load_thumbnail
+
+SIGNATURE_NAME = 'signatures.npz'
+
+# Bump when a signature definition changes.
+SIGNATURE_VERSION = 1
+
+THUMBNAIL_SIZE = 256
+HASH_SIZE = 8          # hash is HASH_SIZE**2 bits
+DCT_SIZE = 32
+HISTOGRAM_BINS = 64
+KINDS = ('phash', 'histogram', 'combined')
+
+# Set bits per byte value; np.bitwise_count would need NumPy 2
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+class ImageSignatures(NamedTuple):
+    folios: list
+    filenames: list
+    checksums: list
+    phash: np.ndarray        # (folios,) uint64
+    histogram: np.ndarray    # (folios, HISTOGRAM_BINS) float32, unit rows
+
+    def position(self, folio: str) -> int:
+        return self.folios.index(folio)
+
+
+def phash(gray: Image.Image) -> int:
+    """64-bit DCT perceptual hash of a grayscale image."""
+    small = np.asarray(gray.resize((DCT_SIZE, DCT_SIZE), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = dctn(small, type=2, norm='ortho')[:HASH_SIZE, :HASH_SIZE].ravel()
+    bits = low > np.median(low[1:])
+    bits[0] = False  # DC only encodes mean brightness
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def intensity_histogram(gray: Image.Image) -> np.ndarray:
+    """Unit-length square-rooted gray histogram."""
+    counts = np.bincount(np.asarray(gray, dtype=np.uint8).ravel() // (256 // HISTOGRAM_BINS),
+                         minlength=HISTOGRAM_BINS)
+    roots = np.sqrt(counts / max(counts.sum(), 1))
+    return (roots / max(np.linalg.norm(roots), 1e-12)).astype(np.float32)
+
+
+def compute_signature(image_path: Path) -> tuple:
+    """(phash, histogram) of one image, read from its thumbnail pyramid."""
+    gray = load_thumbnail(image_path, max_size=THUMBNAIL_SIZE).convert('L')
+    return phash(gray), intensity_histogram(gray)
+
+
+def load_signatures(path: Path) -> Optional[ImageSignatures]:
+    path = Path(path)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['version']) != SIGNATURE_VERSION:
+            return None
+        return ImageSignatures(
+            folios=[str(f) for f in data['folios']],
+            filenames=[str(f) for f in data['filenames']],
+            checksums=[str(c) for c in data['checksums']],
+            phash=data['phash'],
+            histogram=data['histogram'],
+        )
+
+
+def save_signatures(signatures: ImageSignatures, path: Path):
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp.npz')
+    np.savez(tmp, version=SIGNATURE_VERSION, folios=np.array(signatures.folios),
+             filenames=np.array(signatures.filenames), checksums=np.array(signatures.checksums),
+             phash=signatures.phash, histogram=signatures.histogram)
+    tmp.replace(path)
+
+
+def build_signatures(images_dir: Path, output_path: Path = None) -> ImageSignatures:
+    """
+    Signatures for every folio image, recomputing only changed checksums.
+
+    Args:
+        images_dir: Directory containing folio images (and manifest.csv)
+        output_path: Signature file (default: images_dir/signatures.npz)
+
+    Returns:
+        ImageSignatures in folio order
+    """
+    images_dir = Path(images_dir)
+    output_path = Path(output_path) if output_path else images_dir / SIGNATURE_NAME
+    image_files = find_folio_images(images_dir)
+    if not image_files:
+        raise ValueError(f"No folio images found in {images_dir}")
+
+    previous = load_signatures(output_path)
+    known = {} if previous is None else {
+        checksum: (previous.phash[i], previous.histogram[i])
+        for i, checksum in enumerate(previous.checksums)
+    }
+    checksums = [image_checksum(path) for path in image_files]
+    computed = 0
+    hashes, histograms = [], []
+    for path, checksum in zip(image_files, checksums):
+        if checksum not in known:
+            known[checksum] = compute_signature(path)
+            computed += 1
+        hashes.append(known[checksum][0])
+        histograms.append(known[checksum][1])
+
+    signatures = ImageSignatures(
+        folios=[path.stem for path in image_files],
+        filenames=[path.name for path in image_files],
+        checksums=checksums,
+        phash=np.array(hashes, dtype=np.uint64),
+        histogram=np.vstack(histograms).astype(np.float32),
+    )
+    if computed or previous is None or previous.checksums != checksums:
+        save_signatures(signatures, output_path)
+    print(f"✓ Signatures: {len(image_files) - computed} reused, {computed} computed ({output_path})")
+    return signatures
+
+
+def hamming_matrix(hashes: np.ndarray, rows=slice(None)) -> np.ndarray:
+    """Hamming distance (in bits) from hashes[rows] to every hash."""
+    hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+    xor = np.ascontiguousarray(hashes[rows, None] ^ hashes[None, :])
+    return POPCOUNT[xor.view(np.uint8)].reshape(xor.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+def similarity_matrix(signatures: ImageSignatures, kind: str = 'combined', weight: float = 0.5) -> np.ndarray:
+    """
+    All-pairs similarity in [0, 1] (1 = identical signature).
+
+    kind:
+        'phash'      1 - Hamming distance / 64
+        'histogram'  cosine of the square-rooted histograms
+        'combined'   weight * phash + (1 - weight) * histogram
+    """
+    return _similarity(signatures, slice(None), kind, weight)
+
+
+def _similarity(signatures, rows, kind, weight):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown similarity: {kind}. Choose from {KINDS}")
+    parts = {}
+    if kind in ('phash', 'combined'):
+        parts['phash'] = 1 - hamming_matrix(signatures.phash, rows) / HASH_SIZE ** 2
+    if kind in ('histogram', 'combined'):
+        hist = signatures.histogram.astype(np.float64)
+        parts['histogram'] = np.clip(hist[rows] @ hist.T, 0.0, 1.0)
+    if kind == 'combined':
+        return weight * parts['phash'] + (1 - weight) * parts['histogram']
+    return parts[kind]
+
+
+def most_similar(signatures: ImageSignatures, folio: str, k: int = 5,
+                 kind: str = 'combined', weight: float = 0.5) -> List[tuple]:
+    """
+    The k folios most similar to one folio, best first.
+
+    Only one row of the similarity matrix is computed: O(folios).
+
+    Returns:
+        List of (folio, similarity)
+    """
+    i = signatures.position(folio)
+    scores = _similarity(signatures, [i], kind, weight)[0]
+    scores[i] = -np.inf
+    k = min(k, len(scores) - 1)
+    if k <= 0:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.lexsort((best, -scores[best]))]
+    return [(signatures.folios[j], float(scores[j])) for j in best]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Compute perceptual signatures of folio images and query similar folios'
+    )
+    parser.add_argument(
+        '--images-dir',
+        type=str,
+        default='data/raw/yale/images',
+        help='Directory containing folio images'
+    )
+    parser.add_argument(
+        '--query',
+        type=str,
+        nargs='*',
+        default=[],
+        help='Folios to list the most similar folios for'
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=5,
+        help='Number of similar folios to list'
+    )
+    parser.add_argument(
+        '--kind',
+        type=str,
+        default='combined',
+        choices=KINDS,
+        help='Similarity measure'
+    )
+
+    args = parser.parse_args()
+
+    signatures = build_signatures(Path(args.images_dir))
+    for folio in args.query:
+        print(f"\nMost similar to {folio} ({args.kind}):")
+        for other, score in most_similar(signatures, folio, args.top, args.kind):
+            print(f"  {other}: {score:.3f}")
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Normalize folio images for image-based experiments.
+
+For each folio this script:
+1. Applies the EXIF orientation, if any
+2. Crops scanner bed, binding shadow and empty margins, found from the
+   row and column projection profiles of a downsampled grayscale copy
+3. Normalizes color per folio: each channel is stretched so the ink
+   percentile maps to black and the paper percentile to white, which also
+   neutralises the paper tint
+4. Writes the result as PNG to data/derived/images/normalized/
+
+Folios are processed on a process pool with a bounded number in flight.
+The full page is dropped once it is cropped and the color lookup is
+applied to the crop in place, one row strip at a time, so memory per
+worker peaks at the decoded folio plus its crop while cropping, and at
+two copies of the crop (array and PIL image) while saving.
+
+manifest.csv in the output directory is rewritten after every chunk of
+folios and records each source checksum and the settings used; a rerun
+only touches folios whose source or settings changed, and an
+interrupted run loses at most one chunk.
+
+Design principle: Raw images are never modified. Everything here is
+derived and can be regenerated.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageOps
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+from utils.io import find_folio_images
+from utils.thumbnails import image_checksum
+
+OUTPUT_DIR = Path(__file__).parents[2] / 'data/derived/images/normalized'
+MANIFEST_NAME = 'manifest.csv'
+
+# Bump when the algorithm changes in a way the settings do not capture.
+NORMALIZE_VERSION = 1
+
+# Long side of the grayscale copy used for projection profiles
+PROFILE_SIZE = 1024
+# Profile pixels trimmed inside a detected scanner-bed/binding border
+BORDER_INSET = 2
+# Rows processed at a time when applying the color lookup
+STRIP_ROWS = 512
+# Folios per manifest checkpoint
+CHUNK_SIZE = 16
+
+DEFAULT_SETTINGS = {
+    'ink_threshold': 0.02,     # ink fraction marking a row/column as content
+    'border_fraction': 0.9,    # dark fraction marking a row/column as scanner bed/binding
+    'padding': 0.01,           # margin kept around the content, as a fraction of page size
+    'ink_percentile': 1.0,     # maps to black
+    'paper_percentile': 95.0,  # maps to white
+    'min_contrast': 64.0,      # smallest ink-to-paper span stretched to full range
+}
+
+
+def settings_key(settings: dict) -> str:
+    payload = json.dumps({'version': NORMALIZE_VERSION, **settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _smooth(profile: np.ndarray, width: int = 5) -> np.ndarray:
+    """Moving average; edges are padded with their own values, not zeros."""
+    padded = np.pad(profile, (width // 2, width - 1 - width // 2), mode='edge')
+    return np.convolve(padded, np.ones(width) / width, mode='valid')
+
+
+def _extent(active: np.ndarray) -> Tuple[int, int]:
+    """First and one-past-last True index (whole range if none)."""
+    idx = np.flatnonzero(active)
+    return (int(idx[0]), int(idx[-1]) + 1) if len(idx) else (0, len(active))
+
+
+def detect_margins(gray: np.ndarray, settings: dict = DEFAULT_SETTINGS) -> Tuple[int, int, int, int]:
+    """
+    Content box of a grayscale page from its projection profiles.
+
+    Paper level is the median gray value. Pixels much darker than the paper
+    are "dark". Rows and columns that are almost entirely dark (scanner bed,
+    binding shadow) are stripped from the outside in. Within what is left,
+    the content spans the rows and columns whose dark fraction exceeds
+    ink_threshold.
+
+    Args:
+        gray: (h, w) uint8 array
+        settings: See DEFAULT_SETTINGS
+
+    Returns:
+        (left, top, right, bottom) in gray's pixel coordinates
+    """
+    h, w = gray.shape
+    paper = float(np.median(gray))
+    dark = gray < paper * 0.75
+
+    # Strip border rows/columns that are almost all dark, plus a small inset
+    # for the half-dark transition the downsampling leaves at the page edge
+    top, bottom = _extent(dark.mean(axis=1) < settings['border_fraction'])
+    left, right = _extent(dark.mean(axis=0) < settings['border_fraction'])
+    if bottom - top > 2 * BORDER_INSET and right - left > 2 * BORDER_INSET:
+        top += BORDER_INSET if top > 0 else 0
+        bottom -= BORDER_INSET if bottom < h else 0
+        left += BORDER_INSET if left > 0 else 0
+        right -= BORDER_INSET if right < w else 0
+
+    page = dark[top:bottom, left:right]
+    row_top, row_bottom = _extent(_smooth(page.mean(axis=1)) > settings['ink_threshold'])
+    col_left, col_right = _extent(_smooth(page.mean(axis=0)) > settings['ink_threshold'])
+
+    pad_y = int(round(settings['padding'] * h))
+    pad_x = int(round(settings['padding'] * w))
+    return (
+        max(left + col_left - pad_x, left),
+        max(top + row_top - pad_y, top),
+        min(left + col_right + pad_x, right),
+        min(top + row_bottom + pad_y, bottom),
+    )
+
+
+def color_lookup(pixels: np.ndarray, settings: dict = DEFAULT_SETTINGS) -> np.ndarray:
+    """
+    Per-channel 256-entry lookup tables stretching ink to 0 and paper to 255.
+
+    Percentiles are taken from a strided sample, which is plenty for a
+    histogram and avoids sorting every pixel of a full-resolution page.
+    Where ink and paper are closer than min_contrast (a blank or nearly
+    empty page), the span is widened downwards from the paper level: paper
+    still maps to white, and noise is amplified by at most
+    255 / min_contrast instead of being stretched into fake ink.
+
+    Args:
+        pixels: (h, w, c) uint8 array
+        settings: See DEFAULT_SETTINGS
+
+    Returns:
+        (c, 256) uint8 lookup table
+    """
+    step = max(1, int(np.sqrt(pixels.shape[0] * pixels.shape[1] / 250_000)))
+    sample = pixels[::step, ::step].reshape(-1, pixels.shape[2])
+    low = np.percentile(sample, settings['ink_percentile'], axis=0)
+    high = np.percentile(sample, settings['paper_percentile'], axis=0)
+    low = np.minimum(low, high - max(settings['min_contrast'], 1.0))
+    levels = np.arange(256, dtype=np.float64)
+    return np.clip((levels[None, :] - low[:, None]) * 255 / (high - low)[:, None], 0, 255) \
+        .round().astype(np.uint8)
+
+
+def apply_lookup(pixels: np.ndarray, lut: np.ndarray, strip_rows: int = STRIP_ROWS,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Map every channel through its lookup table, one row strip at a time.
+
+    out may be pixels itself: each strip is read before it is overwritten,
+    so the only temporary is one strip of one channel.
+    """
+    out = np.empty_like(pixels) if out is None else out
+    for start in range(0, pixels.shape[0], strip_rows):
+        strip = pixels[start:start + strip_rows]
+        for c in range(pixels.shape[2]):
+            out[start:start + strip_rows, :, c] = lut[c][strip[:, :, c]]
+    return out
+
+
+def normalize_folio(
+    image_path: Path,
+    output_path: Path,
+    settings: dict = DEFAULT_SETTINGS,
+) -> dict:
+    """
+    Crop, color-normalize and save one folio (atomically).
+
+    Returns:
+        Manifest row for the folio
+    """
+    image_path, output_path = Path(image_path), Path(output_path)
+    start = time.perf_counter()
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+
+    # Margins from a small grayscale copy, scaled back to full resolution
+    scale = min(1.0, PROFILE_SIZE / max(img.size))
+    small = img.convert('L').resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                                    Image.Resampling.BOX)
+    left, top, right, bottom = detect_margins(np.asarray(small), settings)
+    box = (int(left / scale), int(top / scale),
+           min(img.width, int(np.ceil(right / scale))), min(img.height, int(np.ceil(bottom / scale))))
+
+    # Writable copy of the crop; the full page is released before the stretch
+    pixels = np.array(img.crop(box))
+    del img, small
+    lut = color_lookup(pixels, settings)
+    normalized = Image.fromarray(apply_lookup(pixels, lut, out=pixels), 'RGB')
+    del pixels
+
+    tmp = output_path.with_name(output_path.name + '.tmp')
+    try:
+        normalized.save(tmp, 'PNG')
+        os.replace(tmp, output_path)
+    except BaseException:
+        if tmp.exists():
+            os.unlink(tmp)
+        raise
+
+    return {
+        'folio': image_path.stem,
+        'source': image_path.name,
+        'source_sha256': image_checksum(image_path),
+        'settings': settings_key(settings),
+        'output': output_path.name,
+        'crop_left': box[0],
+        'crop_top': box[1],
+        'crop_right': box[2],
+        'crop_bottom': box[3],
+        'width': normalized.width,
+        'height': normalized.height,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def iter_normalized(
+    jobs: List[Tuple[Path, Path]],
+    settings: dict,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Normalize (image_path, output_path) pairs on a process pool, in input order.
+
+    Yields:
+        normalize_folio manifest rows
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for image_path, output_path in jobs:
+            yield normalize_folio(image_path, output_path, settings)
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for image_path, output_path in jobs:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(normalize_folio, image_path, output_path, settings))
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_manifest(manifest_path: Path) -> dict:
+    """Stored manifest rows keyed by folio ({} if there is none)."""
+    if not Path(manifest_path).exists():
+        return {}
+    rows = pd.read_csv(manifest_path, dtype={'folio': str, 'settings': str})
+    return {row['folio']: row for row in rows.to_dict('records')}
+
+
+def save_manifest(rows: dict, manifest_path: Path):
+    tmp = manifest_path.with_name(manifest_path.name + '.tmp')
+    pd.DataFrame([rows[folio] for folio in sorted(rows)]).to_csv(tmp, index=False)
+    os.replace(tmp, manifest_path)
+
+
+def normalize_images(
+    images_dir: Path,
+    output_dir: Path = OUTPUT_DIR,
+    settings: dict = None,
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    force: bool = False,
+) -> pd.DataFrame:
+    """
+    Normalize every folio image in images_dir that changed since the last run.
+
+    Args:
+        images_dir: Directory containing folio images
+        output_dir: Where normalized PNGs and manifest.csv go
+        settings: Overrides for DEFAULT_SETTINGS
+        workers: Worker processes (None = all cores)
+        chunk_size: Folios between manifest checkpoints
+        force: Renormalize every folio
+
+    Returns:
+        Manifest DataFrame
+    """
+    images_dir, output_dir = Path(images_dir), Path(output_dir)
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    key = settings_key(settings)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+
+    image_files = find_folio_images(images_dir)
+    if not image_files:
+        raise ValueError(f"No folio images found in {images_dir}")
+    print(f"Found {len(image_files)} folio images")
+
+    rows = load_manifest(manifest_path)
+    jobs = []
+    for image_path in image_files:
+        output_path = output_dir / f"{image_path.stem}.png"
+        row = rows.get(image_path.stem)
+        if (not force and row is not None and output_path.exists()
+                and row['settings'] == key and row['source_sha256'] == image_checksum(image_path)):
+            continue
+        jobs.append((image_path, output_path))
+    print(f"✓ Up to date: {len(image_files) - len(jobs)}, to normalize: {len(jobs)}")
+
+    start = time.perf_counter()
+    for i, row in enumerate(iter_normalized(jobs, settings, workers), 1):
+        rows[row['folio']] = row
+        print(f"Normalized: {row['source']} -> {row['output']} "
+              f"({row['width']}x{row['height']}, {row['seconds']:.2f}s)")
+        if i % chunk_size == 0:
+            save_manifest(rows, manifest_path)
+    save_manifest(rows, manifest_path)
+
+    if jobs:
+        elapsed = time.perf_counter() - start
+        print(f"\nNormalized {len(jobs)} folios in {elapsed:.1f}s ({len(jobs) / elapsed:.2f} folios/s)")
+    print(f"✓ Manifest saved to: {manifest_path}")
+    return pd.read_csv(manifest_path, dtype={'folio': str, 'settings': str})
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Crop margins and normalize color of folio images'
+    )
+    parser.add_argument(
+        '--images-dir',
+        type=str,
+        default='data/raw/yale/images',
+        help='Directory containing folio images'
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=str(OUTPUT_DIR),
+        help='Directory for normalized images and manifest.csv'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes (default: all cores)'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=CHUNK_SIZE,
+        help='Folios between manifest checkpoints'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Renormalize folios that are already up to date'
+    )
+    for name, value in DEFAULT_SETTINGS.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=float,
+            default=value,
+            help=f"Default: {value}"
+        )
+
+    args = parser.parse_args()
+
+    normalize_images(
+        Path(args.images_dir),
+        output_dir=Path(args.output_dir),
+        settings={name: getattr(args, name) for name in DEFAULT_SETTINGS},
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        force=args.force,
+    )
@@ -0,0 +1,206 @@
+"""
+Packed, memory-mapped store of decoded folio pixels.
+
+Every folio is decoded once, converted to 8-bit grayscale ('L') or RGB,
+and written into one flat uint8 file, pixels.bin, at a 64-byte aligned
+offset. index.json records each folio's offset and shape. Opening the
+store maps the file read-only, so indexing a folio returns a view into
+the page cache: no decode, no copy, and every process that opens the same
+store shares the same physical pages.
+
+Stores live under data/derived/cache/image_store/<key>/, keyed by the
+image checksums and the packing settings, so any rescan or settings change
+produces a new store instead of a stale one.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .io import find_folio_images
+from .thumbnails import fitted_size, image_checksum, load_thumbnail
+
+STORE_DIR = Path(__file__).parents[2] / 'data/derived/cache/image_store'
+
+# Bump when the store layout changes.
+STORE_VERSION = 1
+
+MODES = ('L', 'RGB')
+ALIGNMENT = 64
+
+
+class FolioImageStore:
+    """Read-only view of a packed store: store['f001r'] -> (h, w[, 3]) uint8 array."""
+
+    def __init__(self, store_path: Path):
+        self.path = Path(store_path)
+        self.index = json.loads((self.path / 'index.json').read_text())
+        self.mode = self.index['mode']
+        self.folios = list(self.index['folios'])
+        self._position = {folio: i for i, folio in enumerate(self.folios)}
+        total = self.index['total_bytes']
+        # np.memmap refuses zero-length files; an empty store has nothing to map
+        self.pixels = np.memmap(self.path / 'pixels.bin', dtype=np.uint8, mode='r', shape=(total,)) \
+            if total else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.folios)
+
+    def __contains__(self, folio):
+        return folio in self._position
+
+    def __iter__(self):
+        return iter(self.folios)
+
+    def shape(self, folio: str) -> tuple:
+        return tuple(self.index['shapes'][self._position[folio]])
+
+    def __getitem__(self, folio: str) -> np.ndarray:
+        i = self._position[folio]
+        offset = self.index['offsets'][i]
+        shape = tuple(self.index['shapes'][i])
+        return self.pixels[offset:offset + int(np.prod(shape))].reshape(shape)
+
+
+def store_key(image_files: List[Path], mode: str, max_size: Optional[int]) -> str:
+    sha256 = hashlib.sha256(json.dumps({
+        'version': STORE_VERSION,
+        'mode': mode,
+        'max_size': max_size,
+    }, sort_keys=True).encode('utf-8'))
+    for path in image_files:
+        sha256.update(f"{path.stem}:{image_checksum(path)}\n".encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def _decode(image_path: Path, mode: str, max_size: Optional[int]) -> Image.Image:
+    img = load_thumbnail(image_path, max_size=max_size) if max_size else Image.open(image_path)
+    return img.convert(mode)
+
+
+def _packed_shape(image_path: Path, mode: str, max_size: Optional[int]) -> tuple:
+    """Array shape of a decoded image, from the header alone."""
+    with Image.open(image_path) as img:
+        width, height = fitted_size(img.size, max_size) if max_size else img.size
+    return (height, width) if mode == 'L' else (height, width, 3)
+
+
+def _write_folio(pixels_path: Path, total: int, offset: int, shape: tuple,
+                 image_path: Path, mode: str, max_size: Optional[int]):
+    pixels = np.memmap(pixels_path, dtype=np.uint8, mode='r+', shape=(total,))
+    array = np.asarray(_decode(image_path, mode, max_size), dtype=np.uint8)
+    if array.shape != tuple(shape):
+        raise ValueError(f"{image_path.name}: decoded shape {array.shape}, expected {tuple(shape)}")
+    pixels[offset:offset + array.size] = array.ravel()
+    pixels.flush()
+    del pixels
+
+
+def pack_folio_images(
+    image_files: List[Path],
+    store_path: Path,
+    mode: str = 'L',
+    max_size: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Path:
+    """
+    Decode images into a packed store at store_path (atomically replaced).
+
+    Shapes come from the image headers first, so the file is allocated
+    once at its final size; workers then decode folios straight into
+    their own slices of it. Memory per worker is one decoded folio.
+
+    Args:
+        image_files: Images to pack, in store order (folio = file stem)
+        store_path: Store directory to create
+        mode: 'L' (grayscale) or 'RGB'
+        max_size: Longest side per folio, read from the thumbnail pyramid (None = full size)
+        workers: Worker processes (None = all cores, 1 = in-process)
+
+    Returns:
+        store_path
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unsupported mode: {mode}. Choose from {MODES}")
+    store_path = Path(store_path)
+    shapes = [_packed_shape(path, mode, max_size) for path in image_files]
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    offsets = []
+    total = 0
+    for size in sizes:
+        offsets.append(total)
+        total += -(-size // ALIGNMENT) * ALIGNMENT
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=store_path.name + '.', dir=store_path.parent))
+    try:
+        pixels_path = tmp_dir / 'pixels.bin'
+        with open(pixels_path, 'wb') as f:
+            f.truncate(total)
+        jobs = [(pixels_path, total, offset, shape, path, mode, max_size)
+                for offset, shape, path in zip(offsets, shapes, image_files)]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for job in jobs:
+                _write_folio(*job)
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                for future in [executor.submit(_write_folio, *job) for job in jobs]:
+                    future.result()
+        (tmp_dir / 'index.json').write_text(json.dumps({
+            'version': STORE_VERSION,
+            'mode': mode,
+            'max_size': max_size,
+            'folios': [path.stem for path in image_files],
+            'sources': [path.name for path in image_files],
+            'offsets': offsets,
+            'shapes': [list(shape) for shape in shapes],
+            'total_bytes': total,
+        }))
+        os.replace(tmp_dir, store_path)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process won the race; its copy is identical
+        if not (store_path / 'index.json').exists():
+            raise
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return store_path
+
+
+def load_folio_store(
+    images_dir: Path,
+    mode: str = 'L',
+    max_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    store_dir: Path = STORE_DIR,
+) -> FolioImageStore:
+    """
+    Packed store for every folio image in images_dir, packing it on a miss.
+
+    Args:
+        images_dir: Directory containing folio images
+        mode: 'L' (grayscale) or 'RGB'
+        max_size: Longest side per folio (None = full resolution)
+        workers: Worker processes used when packing
+        store_dir: Store cache root
+
+    Returns:
+        FolioImageStore
+    """
+    image_files = find_folio_images(images_dir)
+    if not image_files:
+        raise FileNotFoundError(f"No folio images found in {images_dir}")
+    store_path = Path(store_dir) / store_key(image_files, mode, max_size)
+    if not (store_path / 'index.json').exists():
+        pack_folio_images(image_files, store_path, mode, max_size, workers)
+    return FolioImageStore(store_path)
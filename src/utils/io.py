@@ -6,9 +6,16 @@ data integrity.
 """
 
 from pathlib import Path
+from typing import List, Optional
+
 import pandas as pd
 from PIL import Image
 
+from .thumbnails import load_thumbnail
+
+# Folio image formats, in order of preference when a folio has several
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.ppm')
+
 
 def load_folio_metadata(metadata_dir: Path) -> pd.DataFrame:
     """
@@ -31,22 +38,54 @@ def load_folio_metadata(metadata_dir: Path) -> pd.DataFrame:
     return pd.read_csv(metadata_file, comment='#')
 
 
-def load_folio_image(images_dir: Path, folio_name: str) -> Image.Image:
+def find_folio_images(images_dir: Path, one_per_folio: bool = True) -> List[Path]:
+    """
+    Folio image files (f*.png, f*.jpg, f*.jpeg, f*.ppm, any case) in name order.
+
+    Args:
+        images_dir: Directory containing folio images
+        one_per_folio: Keep one file per folio, preferring formats in
+                       IMAGE_EXTENSIONS order; False lists every file
+
+    Returns:
+        List of image paths
+    """
+    files = sorted(
+        f for f in Path(images_dir).iterdir()
+        if f.name.startswith('f') and f.suffix.lower() in IMAGE_EXTENSIONS and f.is_file()
+    )
+    if not one_per_folio:
+        return files
+    by_folio = {}
+    for f in sorted(files, key=lambda f: IMAGE_EXTENSIONS.index(f.suffix.lower())):
+        by_folio.setdefault(f.stem, f)
+    return [by_folio[folio] for folio in sorted(by_folio)]
+
+
+def load_folio_image(
+    images_dir: Path,
+    folio_name: str,
+    max_size: Optional[int] = None,
+    level: Optional[int] = None,
+) -> Image.Image:
     """
     Load a folio image by name.
     
     Args:
         images_dir: Directory containing folio images
         folio_name: Folio name (e.g., 'f001r')
+        max_size: Longest side wanted; served from the thumbnail pyramid
+        level: Explicit pyramid level (0 = full resolution)
     
     Returns:
-        PIL Image object
+        PIL Image object (full resolution if neither max_size nor level is given)
     """
-    # Try PNG first, then JPEG
-    for ext in ['.png', '.jpg', '.jpeg']:
-        img_path = images_dir / f"{folio_name}{ext}"
+    for ext in IMAGE_EXTENSIONS:
+        img_path = Path(images_dir) / f"{folio_name}{ext}"
         if img_path.exists():
-            return Image.open(img_path)
+            if max_size is None and level is None:
+                return Image.open(img_path)
+            return load_thumbnail(img_path, max_size=max_size, level=level)
     
     raise FileNotFoundError(f"Image not found for folio: {folio_name}")
 
@@ -0,0 +1,176 @@
+"""
+On-disk thumbnail pyramid for folio images.
+
+Each image gets a stack of JPEG levels, level k being the original halved
+k times (box filter), down to MIN_SIZE pixels on the long side. Levels
+live under data/derived/cache/thumbnails/<sha256>/, so the cache key is
+the image content itself: a rescanned folio gets a fresh pyramid and the
+stale one is simply never asked for again.
+
+Checksums are taken from the images directory's manifest.csv (written by
+ingestion/verify_images.py) whenever its size and mtime still match, and
+only computed otherwise.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from PIL import Image
+
+THUMBNAIL_DIR = Path(__file__).parents[2] / 'data/derived/cache/thumbnails'
+
+# Bump when the pyramid layout or encoding changes.
+PYRAMID_VERSION = 2
+
+# Smallest level stored: halving stops once the long side is at most this
+MIN_SIZE = 256
+JPEG_QUALITY = 90
+
+_checksums = {}
+
+
+def _signature(image_path: Path) -> tuple:
+    stat = image_path.stat()
+    return str(image_path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def _manifest_checksum(image_path: Path, signature: tuple) -> Optional[str]:
+    """sha256 from manifest.csv next to the image, if it still describes the file."""
+    manifest = image_path.parent / 'manifest.csv'
+    if not manifest.exists():
+        return None
+    rows = pd.read_csv(manifest, dtype={'filename': str})
+    if 'mtime_ns' not in rows:
+        return None
+    for row in rows.itertuples():
+        _checksums[(str((image_path.parent / row.filename).resolve()), row.size_bytes, row.mtime_ns)] = \
+            row.checksum_sha256
+    return _checksums.get(signature)
+
+
+def image_checksum(image_path: Path) -> str:
+    """SHA256 of an image file, memoised on (path, size, mtime)."""
+    image_path = Path(image_path)
+    signature = _signature(image_path)
+    if signature in _checksums:
+        return _checksums[signature]
+    checksum = _manifest_checksum(image_path, signature)
+    if checksum is None:
+        with open(image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            checksum = hashlib.sha256(mapped).hexdigest()
+        _checksums[signature] = checksum
+    return checksum
+
+
+def level_sizes(size: tuple) -> list:
+    """(width, height) of every level, level 0 being the original."""
+    sizes = [tuple(size)]
+    while max(sizes[-1]) > MIN_SIZE:
+        w, h = sizes[-1]
+        # Image.reduce(2) keeps the odd last row/column as a partial box
+        sizes.append(((w + 1) // 2, (h + 1) // 2))
+    return sizes
+
+
+def build_pyramid(image_path: Path, pyramid_path: Path) -> dict:
+    """Write levels 1..n and meta.json for one image, atomically replacing pyramid_path."""
+    pyramid_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=pyramid_path.name + '.', dir=pyramid_path.parent))
+    try:
+        with Image.open(image_path) as img:
+            meta = {
+                'version': PYRAMID_VERSION,
+                'source': Path(image_path).name,
+                'sizes': level_sizes(img.size),
+            }
+            level = img.convert('L' if img.mode in ('1', 'L', 'I', 'I;16', 'F') else 'RGB')
+            for k in range(1, len(meta['sizes'])):
+                level = level.reduce(2)
+                level.save(tmp_dir / f'level{k}.jpg', 'JPEG', quality=JPEG_QUALITY)
+                meta['sizes'][k] = level.size
+        (tmp_dir / 'meta.json').write_text(json.dumps(meta))
+        os.replace(tmp_dir, pyramid_path)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process won the race; its copy is identical
+        if not (pyramid_path / 'meta.json').exists():
+            raise
+    return meta
+
+
+def load_pyramid(image_path: Path, thumbnail_dir: Path = THUMBNAIL_DIR) -> tuple:
+    """
+    Pyramid directory and metadata for an image, building it on a miss.
+
+    Returns:
+        (pyramid_path, meta) with meta['sizes'] listing every level's size
+    """
+    pyramid_path = Path(thumbnail_dir) / f"{image_checksum(image_path)}-v{PYRAMID_VERSION}"
+    meta_path = pyramid_path / 'meta.json'
+    if meta_path.exists():
+        return pyramid_path, json.loads(meta_path.read_text())
+    return pyramid_path, build_pyramid(Path(image_path), pyramid_path)
+
+
+def fitted_size(size: tuple, max_size: int) -> tuple:
+    """(width, height) of an image scaled down to fit max_size, aspect kept; never enlarged."""
+    w, h = size
+    scale = min(1.0, max_size / max(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def choose_level(sizes: list, max_size: int) -> int:
+    """Smallest level whose long side still covers max_size (0 if none do)."""
+    level = 0
+    for k, size in enumerate(sizes):
+        if max(size) >= max_size:
+            level = k
+    return level
+
+
+def load_thumbnail(
+    image_path: Path,
+    max_size: Optional[int] = None,
+    level: Optional[int] = None,
+    thumbnail_dir: Path = THUMBNAIL_DIR,
+) -> Image.Image:
+    """
+    Load an image at reduced resolution from its pyramid.
+
+    Args:
+        image_path: Original image file
+        max_size: Longest side wanted; the result is fitted_size(original, max_size),
+                  whichever level it is read from
+        level: Explicit pyramid level (0 = original), clamped to the deepest
+        thumbnail_dir: Pyramid cache root
+
+    Returns:
+        PIL Image (decoded; level 0 is opened lazily as usual)
+    """
+    image_path = Path(image_path)
+    # Level sizes follow from the header, so level 0 never builds a pyramid
+    img = Image.open(image_path)
+    sizes = level_sizes(img.size)
+    if level is None:
+        level = choose_level(sizes, max_size) if max_size else 0
+    level = min(max(level, 0), len(sizes) - 1)
+
+    if level > 0:
+        img.close()
+        pyramid_path, _ = load_pyramid(image_path, thumbnail_dir)
+        img = Image.open(pyramid_path / f'level{level}.jpg')
+    if max_size:
+        target = fitted_size(sizes[0], max_size)
+        # JPEG draft decodes at 1/2, 1/4 or 1/8 scale, never below the request
+        if img.format == 'JPEG':
+            img.draft(img.mode, target)
+        if img.size != target:
+            img = img.resize(target, Image.Resampling.BICUBIC, reducing_gap=2.0)
+    return img
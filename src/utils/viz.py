@@ -7,8 +7,14 @@ import numpy as np
 from PIL import Image
 from pathlib import Path
 
+from .thumbnails import load_thumbnail
 
-def plot_folio_grid(folio_images: list, titles: list = None, figsize=(20, 15)):
+# Long side of each grid cell in pixels; plenty for a 20-inch figure
+GRID_MAX_SIZE = 1024
+
+
+def plot_folio_grid(folio_images: list, titles: list = None, figsize=(20, 15),
+                    max_size: int = GRID_MAX_SIZE):
     """
     Plot a grid of folio images.
     
@@ -16,6 +22,8 @@ def plot_folio_grid(folio_images: list, titles: list = None, figsize=(20, 15)):
         folio_images: List of PIL Images or image paths
         titles: List of titles (optional)
         figsize: Figure size tuple
+        max_size: Longest side drawn per cell (None = full resolution).
+                  Paths are read from the thumbnail pyramid.
     """
     n = len(folio_images)
     cols = min(3, n)
@@ -34,7 +42,10 @@ def plot_folio_grid(folio_images: list, titles: list = None, figsize=(20, 15)):
             break
         
         if isinstance(img, (str, Path)):
-            img = Image.open(img)
+            img = load_thumbnail(img, max_size=max_size) if max_size else Image.open(img)
+        elif max_size and max(img.size) > max_size:
+            img = img.copy()
+            img.thumbnail((max_size, max_size))
         
         axes[i].imshow(img)
         if titles and i < len(titles):